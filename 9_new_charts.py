@@ -53,6 +53,8 @@ df['status'] = df.status.fillna('extreme')
 # Relative distnacer (distance to SUN/SUM radius)
 df.loc[:, 'relative_dist'] = df['A']/df['RSTAR']
 
+webgl_threshold = 1000  # порог числа точек для перехода на WebGL
+
 options = []
 for k in names:
     options.append({'label' : k, 'value' : k})
@@ -140,13 +142,16 @@ def update_dist_temp_chart(n, radius_range, star_size):
         return html.Div('Please select more data'), html.Div(), html.Div(), html.Div()  # Если выбор пустой, то возвращаем предупреждение
     
 
-    fig1 = px.scatter(chart_data, x = 'TPLANET', y = 'A', color = 'StarSize')  # по x - Tplanet, по y - A, разбивка по цветам в зависимости от категории StarSize
+    # больше 1000 точек рисуем через WebGL (Scattergl) - SVG на таких объемах тормозит
+    mode = 'webgl' if len(chart_data) > webgl_threshold else 'svg'
+
+    fig1 = px.scatter(chart_data, x = 'TPLANET', y = 'A', color = 'StarSize', render_mode = mode)  # по x - Tplanet, по y - A, разбивка по цветам в зависимости от категории StarSize
 
     html1 = [html.Div('Planet Temperature ~ Distance from the Star'),  # название графика
             dcc.Graph(figure = fig1)]  # второй элемент - списка график
 
     fig2 = px.scatter(chart_data, x = 'RA', y = 'DEC', size = 'RPLANET', 
-                                                        color = 'status')
+                                                        color = 'status', render_mode = mode)
 
     html2 = [html.Div('Position on the Celestial Sphere'),
             dcc.Graph(figure = fig2)]
@@ -159,7 +164,7 @@ def update_dist_temp_chart(n, radius_range, star_size):
     html3 = [html.Div('Relative Distance (AU/SOL radii'), 
             dcc.Graph(figure = fig3)]
 
-    fig4 = px.scatter(chart_data, x = 'MSTAR', y = 'TSTAR', size = 'RPLANET', color = 'status')
+    fig4 = px.scatter(chart_data, x = 'MSTAR', y = 'TSTAR', size = 'RPLANET', color = 'status', render_mode = mode)
     html4 = [html.Div('Star Mass ~ Star Temperature'), 
             dcc.Graph(figure = fig4)]
 
@@ -1,65 +1,83 @@
-from dash import Input, Output, State
+import os
+import time
+import uuid
+
+# STARTUP: профиль импортов и ленивый режим включаются до импорта библиотек
+# (EXO_STARTUP_PROFILE=1, EXO_LAZY_IMPORTS=1, EXO_SKIP_JUPYTER=1, см. startup.py)
+from startup import lap, lazy_import, report_startup, setup_imports
+setup_imports()
+
+from dash import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash
 import dash_bootstrap_components as dbc
 from dash import html
 from dash import dcc  # в этой библиотеке находятся слайдеры и прочее
-import requests
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.io as poi
 from dash import dash_table  # компонент для создания таблиц
 import plotly.graph_objects as go
 
-poi.renderers.default = 'browser'  # режим отображения в браузере
+from cache import LRUCache, ResultCache, make_key
+from catalog import (DELTA_SYNC, REFRESH_INTERVAL, CatalogState, DeltaCatalog, build_catalog,
+                     load_catalog, names)
+from charts import (DOWNSAMPLE_MODE, binned_heatmap, compact_figure, downsample, figure_patch,
+                    histogram_figure, histogram_traces, needs_aggregation, needs_downsampling,
+                    point_delta, render_mode, scatter_layout, scatter_traces, trace_signature)
+from clientside import CLIENTSIDE_FILTER, catalog_payload
+from datatable import filter_positions, page_columns, page_count, sort_positions
+from encoder import use_encoder
+from live import LIVE_DEBOUNCE, LIVE_FILTER, LatestRequests
+from metrics import instrument, phase
+from responses import asset_url, tune_responses
+from shared import SHARED_DIR, SHARED_POLL_INTERVAL, SharedCatalog
+
+# px нужен только для гистограммы в клиентском режиме
+px = lazy_import('plotly.express')
+lap('imports')
 # импорт библиотек dash
 # импортируем компоненты для того, чтобы график реагировал на изменения
 
 """" READ DATA """
 
-# с помощью API считываем данные с сайта sterank.com/kepler с пустым параметром запроса и лимитом в 2000
-response = requests.get('http://asterank.com/api/kepler?query={}&limit=2000')
-df = pd.json_normalize(response.json())  # нормализация json
-df = df[df['PER'] > 0]  # отрезаем нежелательную точку с периодом < 0
-df['KOI'] = df['KOI'].astype(int, errors='ignore')
-
-# Create Star size category
-
-# разбиваем на категории по метрикам сравнения с метриками солнце
-bins = [0, 0.8, 1.2, 100]
-names = ['small', 'similar', 'bigger']
-df['StarSize'] = pd.cut(df['RSTAR'], bins, labels=names)
-
-# TEMPERATURE BINS (бакеты по температуре планет)
-tp_bins = [0, 200, 400, 500, 5000]
-tp_labels = ['low', 'optimal', 'high', 'extreme']
-# задаем переменную. Разбиваем температуру по бинам + в зависимости от этого лейбл
-df['temp'] = pd.cut(df['TPLANET'], tp_bins, labels=tp_labels)
-
-#  SIZE_BINS (бакеты по размерам планеты в зависимости от радиуса Земли)
-
-rp_bins = [0, 0.5, 2, 4, 100]
-rp_labels = ['low', 'optimal', 'high', 'extreme']  # лейблы по бакетам
-# по аналогии делаем соответствие по радиусам
-df['gravity'] = pd.cut(df['RPLANET'], rp_bins, labels=rp_labels)
-
-#  ESTIMATE OBJECT STATUS (разбиваем объекты по статусам)
-#  Если temp == optimal и gravity == optimal => promising
-df['status'] = np.where((df['temp'] == 'optimal')
-                        & (df['gravity'] == 'optimal'),
-                        'promising', None)
-#  Если и не optimal, и не extreme, то challening для нас
-df.loc[:, 'status'] = np.where((df['temp'] == 'optimal') &
-                               (df['gravity'].isin(['low', 'high'])),
-                               'challening', df['status'])
-df.loc[:, 'status'] = np.where((df['gravity'] == 'optimal') &
-                               (df['temp'].isin(['low', 'high'])),
-                               'challening', df['status'])
-#  В остальных случаях значение extreme
-df['status'] = df.status.fillna('extreme')
-
-# Relative distnacer (distance to SUN/SUM radius)
-df.loc[:, 'relative_dist'] = df['A']/df['RSTAR']
+# считываем данные с сайта asterank.com/kepler через локальный снимок на диске:
+# сеть нужна только при первом запуске или когда снимок устарел (см. catalog.py)
+# в режиме EXO_DELTA_SYNC обновляются только изменившиеся страницы каталога
+delta_catalog = DeltaCatalog() if DELTA_SYNC else None
+if SHARED_DIR:
+    # один каталог на все воркеры: его строит первый воркер, остальные
+    # подключаются к опубликованному сегменту без копирования
+    shared_catalog = SharedCatalog(delta_catalog.build if DELTA_SYNC
+                                   else lambda: build_catalog(load_catalog()),
+                                   max_age=REFRESH_INTERVAL)
+    state = CatalogState(shared_catalog.load(), loader=shared_catalog.refresh)
+    lap('catalog')
+elif DELTA_SYNC:
+    state = CatalogState(delta_catalog.load(), loader=delta_catalog.refresh)
+    lap('catalog')
+else:
+    raw_catalog = load_catalog()
+    lap('catalog fetch')
+    # производные колонки, категории и индекс фильтра
+    state = CatalogState(build_catalog(raw_catalog))
+    del raw_catalog
+    lap('catalog derive')
+df = state.df  # начальный датафрейм нужен только для построения слайсеров
+
+
+def start_background_tasks():
+    # фоновое обновление каталога: новый датафрейм подменяется целиком,
+    # колбэки, которые уже работают, досчитываются на старом поколении.
+    # Потоки не переживают fork, поэтому запускаем их в процессе, который
+    # обслуживает запросы (при gunicorn --preload - в post_fork воркера).
+    # EXO_REFRESH_INTERVAL=0 выключает обновление и в режиме общего каталога
+    if REFRESH_INTERVAL <= 0:
+        return
+    state.start_refresh(SHARED_POLL_INTERVAL if SHARED_DIR else REFRESH_INTERVAL)
+
+# отфильтрованные данные храним на сервере, в dcc.Store уходит только ключ
+# (EXO_RESULT_CACHE_DIR - общий для воркеров кэш на диске)
+results = ResultCache(maxsize=int(os.environ.get('EXO_RESULT_CACHE_SIZE', 32)),
+                      directory=os.environ.get('EXO_RESULT_CACHE_DIR'),
+                      disk_maxsize=int(os.environ.get('EXO_RESULT_CACHE_DISK_SIZE', 256)))
 
 # GLOBAL DESIGN SETTINGS (задаем теймплейт на глобальном уровне)
 charts_template = go.layout.Template(
@@ -75,6 +93,17 @@ charts_template = go.layout.Template(
 
 color_status_values = ['lightgray', '#1F85DE', '#f90f04']
 
+# готовые фигуры (dict) по ключу фильтра, поколению данных и шаблону
+figures = LRUCache(maxsize=int(os.environ.get('EXO_FIGURE_CACHE_SIZE', 64)))
+# шаблон в том виде, в каком он попадает в фигуру (порядок ключей как у plotly)
+charts_template_json = go.Figure(
+    layout={'template': charts_template}).to_plotly_json()['layout']['template']
+template_key = make_key(charts_template_json)
+# последние запросы live-фильтра по сессиям
+live_requests = LatestRequests()
+# порядок строк таблицы после ее собственных фильтра и сортировки
+table_views = LRUCache(maxsize=int(os.environ.get('EXO_TABLE_CACHE_SIZE', 64)))
+
 options = []
 for k in names:
     options.append({'label': k, 'value': k})
@@ -99,52 +128,204 @@ rplanet_selector = dcc.RangeSlider(
     marks={5: '5', 10: '10', 20: '20'},  # метки данных
     step=1,
     # значения в слайсере "между" по умолчанию
-    value=[min(df['RPLANET']), max(df['RPLANET'])]
+    value=[min(df['RPLANET']), max(df['RPLANET'])],
+    # в live- и клиентском режимах значение отправляется во время перетаскивания
+    updatemode='drag' if LIVE_FILTER or CLIENTSIDE_FILTER else 'mouseup'
 )
 
+# CHARTS (каждый график строится своей функцией)
+
+
+def lean_figure(traces, layout):
+    # фигура-словарь без px и валидаторов: шаблон уже проверен и готов
+    return {'data': traces, 'layout': dict({'template': charts_template_json}, **layout)}
+
+
+def heatmap_figure(chart_data, x, y):
+    fig = binned_heatmap(chart_data, x, y)
+    fig.update_layout(template=charts_template)
+    return compact_figure(fig).to_plotly_json()
+
+
+def add_earth_line(fig):
+    fig.add_vline(x=1, y0=0, y1=155, annotation_text='Earth', line_dash='dot',
+                  exclude_empty_subplots=False)  # вертикальная линия (уровень Земли)
+    return fig
+
+
+# макет гистограммы (подграфики, шаблон, линия Земли) от данных не зависит
+relative_dist_layout = add_earth_line(
+    histogram_figure('relative_dist', 'status').update_layout(template=charts_template)
+).to_plotly_json()['layout']
+lap('chart templates')
+
+
+def dist_temp_figure(chart_data):
+    # на больших выборках: WebGL, а затем прореживание или 2D-гистограмма
+    if needs_downsampling(len(chart_data)) and DOWNSAMPLE_MODE == 'heatmap':
+        return heatmap_figure(chart_data, 'TPLANET', 'A')
+    plot_data = downsample(chart_data, 'StarSize')
+    # по x - Tplanet, по y - A, разбивка по цветам в зависимости от категории StarSize
+    return lean_figure(scatter_traces(plot_data, 'TPLANET', 'A', 'StarSize', color_status_values,
+                                      render_mode=render_mode(len(plot_data))),
+                       scatter_layout('TPLANET', 'A', 'StarSize'))
+
+
+def celestial_figure(chart_data):
+    if needs_downsampling(len(chart_data)) and DOWNSAMPLE_MODE == 'heatmap':
+        return heatmap_figure(chart_data, 'RA', 'DEC')
+    plot_data = downsample(chart_data, 'status')
+    return lean_figure(scatter_traces(plot_data, 'RA', 'DEC', 'status', color_status_values,
+                                      size='RPLANET', render_mode=render_mode(len(plot_data))),
+                       scatter_layout('RA', 'DEC', 'status', size='RPLANET'))
+
+
+def relative_dist_figure(chart_data):
+    # RELATIVE DISTANCE CHART
+    # бины и KDE считаются на сервере; в клиентском режиме браузер сам
+    # пересобирает трейсы из сырых значений, поэтому там остается px
+    if needs_aggregation(len(chart_data)) and not CLIENTSIDE_FILTER:
+        return {'data': histogram_traces(chart_data, 'relative_dist', 'status', color_status_values),
+                'layout': relative_dist_layout}
+    fig = px.histogram(chart_data, x='relative_dist',
+                       color='status', barmode='overlay', marginal='violin', color_discrete_sequence=color_status_values)
+    fig.update_layout(template=charts_template)
+    return compact_figure(add_earth_line(fig)).to_plotly_json()
+
+
+def mstar_tstar_figure(chart_data):
+    plot_data = downsample(chart_data, 'status')
+    return lean_figure(scatter_traces(plot_data, 'MSTAR', 'TSTAR', 'status', color_status_values,
+                                      size='RPLANET', render_mode=render_mode(len(plot_data))),
+                       scatter_layout('MSTAR', 'TSTAR', 'status', size='RPLANET'))
+
+
+# id контейнера графика -> (название графика, функция построения)
+charts = {
+    'dist-temp-chart': ('Planet Temperature ~ Distance from the Star', dist_temp_figure),
+    'celestial-chart': ('Position on the Celestial Sphere', celestial_figure),
+    'relative-dist-chart': ('Relative Distance (AU/SOL radii', relative_dist_figure),
+    'mstar-tstar-chart': ('Star Mass ~ Star Temperature', mstar_tstar_figure)
+}
+
+# колонки, по которым клиентский фильтр пересобирает трейсы графика
+chart_columns = {
+    'dist-temp-chart': {'x': 'TPLANET', 'y': 'A', 'color': 'StarSize'},
+    'celestial-chart': {'x': 'RA', 'y': 'DEC', 'size': 'RPLANET', 'color': 'status'},
+    'relative-dist-chart': {'x': 'relative_dist', 'color': 'status'},
+    'mstar-tstar-chart': {'x': 'MSTAR', 'y': 'TSTAR', 'size': 'RPLANET', 'color': 'status'}
+}
+client_columns = sorted({'RPLANET', 'StarSize'} |
+                        {col for spec in chart_columns.values() for col in spec.values()})
+# скаттеры, которые в live-режиме обновляются дельтой точек (см. live_chart)
+delta_charts = ([chart_id for chart_id, spec in chart_columns.items() if 'y' in spec]
+                if LIVE_FILTER and not CLIENTSIDE_FILTER else [])
+
+
+def build_figure(chart_id, chart_data):
+    # фигура в виде словаря для dcc.Graph, числовые массивы - компактными
+    # типизированными массивами (см. charts.typed_array)
+    return charts[chart_id][1](chart_data)
+
+
+def chart_container(chart_id):
+    if not CLIENTSIDE_FILTER:
+        # график постоянный, колбэк обновляет его фигуру (см. render_chart);
+        # до первого ответа колбэка график скрыт
+        body = [html.H4(charts[chart_id][0]),  # название графика
+                dcc.Graph(id=chart_id + '-graph'),
+                # набор трейсов, который сейчас в браузере
+                dcc.Store(id=chart_id + '-traces')]
+        if chart_id in delta_charts:
+            # дельта точек от сервера и ключ выборки, которую показывает график
+            body += [dcc.Store(id=chart_id + '-delta'), dcc.Store(id=chart_id + '-shown')]
+        return html.Div([html.Div(id=chart_id + '-message'),
+                         html.Div(body, id=chart_id + '-body', style={'display': 'none'})],
+                        id=chart_id)
+    # в клиентском режиме график постоянный: сервер строит его один раз по
+    # всему каталогу, дальше браузер только подменяет данные трейсов
+    title = charts[chart_id][0]
+    return html.Div([html.H4(title),
+                     dcc.Graph(id=chart_id + '-graph', figure=build_figure(chart_id, df)),
+                     dcc.Store(id=chart_id + '-spec', data=chart_columns[chart_id])],
+                    id=chart_id)
+
+
 # TABS CONTENT
 tab1_content = [dbc.Row([
-    dbc.Col(html.Div(id='dist-temp-chart'), md=6),
-    dbc.Col(html.Div(id='celestial-chart'), md=6)
+    dbc.Col(chart_container('dist-temp-chart'), md=6),
+    dbc.Col(chart_container('celestial-chart'), md=6)
 ], style={'margin-top': 20}),  # задаем верхний отступ (для заголовков графиков)
     dbc.Row([
-        dbc.Col(html.Div(id='relative-dist-chart'),
+        dbc.Col(chart_container('relative-dist-chart'),
             md=6),  # график по расстоянию
         # график с массой и температурой звезды
-        dbc.Col(html.Div(id='mstar-tstar-chart'))
+        dbc.Col(chart_container('mstar-tstar-chart'))
     ])]
 
-tab2_content = [dbc.Row(html.Div(id='data-table'), style={'margin-top': 20})]
+# RAW DATA TABLE
+# выводим наш датафрейм без указанных колонок
+table_columns = [i for i in df.columns
+                 if i not in ['relative_dist', 'StarSize', 'ROW', 'temp', 'gravity']]
+# страницы, сортировка и фильтр таблицы считаются на сервере: в браузер
+# уходит только видимая страница (см. колбэк update_table)
+raw_table = dash_table.DataTable(id='raw-table',
+                                 columns=[{'name': i, 'id': i}
+                                          for i in table_columns],
+                                 style_data={'width': '100px',
+                                             'maxWidth': '100px',
+                                             'minWidth': '100px'},
+                                 page_current=0,
+                                 # Количество элементов (в нашем случае строк) на странице
+                                 page_size=30,
+                                 page_action='custom',
+                                 sort_action='custom',
+                                 sort_mode='multi',
+                                 sort_by=[],
+                                 filter_action='custom',
+                                 filter_query='',
+                                 # Задаем стиль заголовка (выравниваем по центру)
+                                 style_header={'textAlign': 'center'})
+
+tab2_content = [dbc.Row(html.Div([html.H4('Raw Data'), raw_table,
+                                  # страница таблицы в колоночном виде (см. update_table)
+                                  dcc.Store(id='raw-table-page')], id='data-table'),
+                        style={'margin-top': 20})]
 app = dash.Dash(__name__,
                 external_stylesheets=[dbc.themes.FLATLY])  # инициализация приложения
 
-# Tab3 conent
-table_header = [html.Thead(
-    html.Tr([html.Th('Field Name'), html.Th('Details')]))]
+# Tab3 conent (собирается только при открытии вкладки, см. render_about)
+
 
-expl = {'KOI': 'Onject of Interest number',
-        'A': 'Semi-major axis (AU)'}
+def about_content():
+    table_header = [html.Thead(
+        html.Tr([html.Th('Field Name'), html.Th('Details')]))]
 
-tbl_rows = []
-for i in expl:
-    tbl_rows.append(html.Tr([html.Td(i), html.Td(expl[i])]))
-table_body = [html.Tbody(tbl_rows)]
-table = dbc.Table(table_header + table_body, bordered=True)
+    expl = {'KOI': 'Onject of Interest number',
+            'A': 'Semi-major axis (AU)'}
+
+    tbl_rows = []
+    for i in expl:
+        tbl_rows.append(html.Tr([html.Td(i), html.Td(expl[i])]))
+    table_body = [html.Tbody(tbl_rows)]
+    table = dbc.Table(table_header + table_body, bordered=True)
+
+    text = 'Data are sourced from Kepler API via asterank.com'
+    tab3_content = [
+        dbc.Row(html.A(text, href='https://www.asterank.com/kepler'),
+                style={'margin-top': 20}),
+        dbc.Row(html.Div(children=table),
+                style={'margin-top': 20})]
+    return tab3_content
 
-text = 'Data are sourced from Kepler API via asterank.com'
-tab3_content = [
-    dbc.Row(html.A(text, href='https://www.asterank.com/kepler'),
-            style={'margin-top': 20}),
-    dbc.Row(html.Div(children=table),
-            style={'margin-top': 20})]
 
 """" LAYOUT """
 
-app.layout = html.Div([
+layout = html.Div([
     # header
     dbc.Row([
         dbc.Col(
-            html.Img(src=app.get_asset_url('images/exo_img.png'),
+            html.Img(src=asset_url(app, 'images/exo_img.png'),  # адрес с отпечатком
                      style={'width': '100px', 'margin-left': '40px'}),
             width={'size': 1}
         ),
@@ -162,6 +343,7 @@ app.layout = html.Div([
             width={'size': 4})],
         className='app-header'),
     dcc.Store(id='filtered-data', storage_type='session'),
+    dcc.Store(id='catalog-data', storage_type='session'),
     # body
     html.Div([
         # filters
@@ -182,99 +364,297 @@ app.layout = html.Div([
             style={'margin-bottom': 40}),
         # charts
         dbc.Tabs([
-            dbc.Tab(tab1_content, label='Charts'),
-            dbc.Tab(tab2_content, label='Data'),
-            dbc.Tab(tab3_content, label='About')
-        ])
+            dbc.Tab(tab1_content, label='Charts', tab_id='tab-charts'),
+            dbc.Tab(tab2_content, label='Data', tab_id='tab-data'),
+            dbc.Tab(html.Div(id='about-content'), label='About', tab_id='tab-about')
+        ], id='tabs', active_tab='tab-charts')
     ],
         className='app-body')
 ])
 
+
+def serve_layout():
+    # у каждой вкладки браузера свой id сессии: по нему live-режим
+    # отбрасывает устаревшие запросы той же сессии
+    return html.Div([dcc.Store(id='session-id', data=uuid.uuid4().hex), layout])
+
+
+app.layout = serve_layout
+lap('layout')
+
 """" CALLBACK """
 
 
-@ app.callback(
-    Output(component_id='filtered-data', component_property='data'),
-    [Input(component_id='submit-val', component_property='n_clicks')],
-    [State(component_id='range-slider', component_property='value'),
-     State(component_id='star-selector', component_property='value')]
-)
-def filter_data(n, radius_range, star_size):
-    my_data = df[(df['RPLANET'] > radius_range[0]) &
-                 (df['RPLANET'] < radius_range[1]) &
-                 (df['StarSize'].isin(star_size))]
-    return my_data.to_json(date_format='iso', orient='split',
-                           default_handler=str)
+# в live-режиме фильтр пересчитывается при каждом изменении слайдера и
+# списка, без кнопки Apply
+if LIVE_FILTER:
+    filter_inputs = [Input(component_id='submit-val', component_property='n_clicks'),
+                     Input(component_id='range-slider', component_property='value'),
+                     Input(component_id='star-selector', component_property='value')]
+    filter_state = [State(component_id='session-id', component_property='data')]
+else:
+    filter_inputs = [Input(component_id='submit-val', component_property='n_clicks')]
+    filter_state = [State(component_id='range-slider', component_property='value'),
+                    State(component_id='star-selector', component_property='value'),
+                    State(component_id='session-id', component_property='data')]
 
 
 @ app.callback(
-    [Output(component_id='dist-temp-chart', component_property='children'),
-     Output(component_id='celestial-chart', component_property='children'),
-     Output(component_id='relative-dist-chart', component_property='children'),
-     Output(component_id='mstar-tstar-chart', component_property='children'),
-     Output(component_id='data-table', component_property='children')],
-    [Input(component_id='filtered-data', component_property='data')]
+    Output(component_id='filtered-data', component_property='data'),
+    filter_inputs,
+    filter_state
 )
-def update_dist_temp_chart(data):
-    chart_data = pd.read_json(data, orient='split')
+def filter_data(n, radius_range, star_size, session_id):
+    seq = None
+    if LIVE_FILTER:
+        # склейка запросов: ждем немного и выходим, если за это время
+        # пришло более новое значение от той же сессии
+        seq = live_requests.begin(session_id)
+        time.sleep(LIVE_DEBOUNCE)
+        if not live_requests.is_current(session_id, seq):
+            raise PreventUpdate
+
+    generation = state.generation
+    key, _ = cached_selection(radius_range, star_size)
+    # в браузер уходит только ключ и параметры фильтра (по ним другой воркер
+    # или колбэк после вытеснения из кэша восстановит выборку)
+    return {'key': key, 'generation': generation,
+            'range': radius_range, 'star_size': star_size,
+            'session': session_id, 'seq': seq}
+
+
+def select_data(radius_range, star_size, snapshot=None):
+    # берем текущее поколение один раз на весь вызов; строки находим по
+    # индексу (отсортированный RPLANET + коды StarSize), без полного прохода
+    _, df, index, _ = snapshot or state.snapshot()
+    with phase('filter'):
+        return df.iloc[index.query(radius_range[0], radius_range[1], star_size)]
+
+
+def cached_selection(radius_range, star_size):
+    # (ключ, выборка). Ключ - отпечаток содержимого данных, а не номер
+    # поколения: он одинаков во всех воркерах и после рестарта, поэтому
+    # выборка из общего кэша на диске всегда соответствует данным
+    snapshot = state.snapshot()
+    key = make_key(snapshot[3], radius_range, sorted(star_size or []))
+    chart_data = results.get(key)
+    if chart_data is None:
+        chart_data = select_data(radius_range, star_size, snapshot)
+        results.set(key, chart_data)
+    return key, chart_data
+
+
+def load_filtered(data):
+    chart_data = results.get(data['key'])
+    if chart_data is None:
+        # выборки нет в кэше (или у этого воркера другие данные) - считаем
+        # заново и сохраняем под ключом тех данных, по которым считали
+        _, chart_data = cached_selection(data['range'], data['star_size'])
+    return chart_data
+
+
+def cached_figure(chart_id, data, chart_data):
+    # одинаковые фильтры (в т.ч. у разных пользователей) получают готовую
+    # фигуру из кэша вместо вызова px.*
+    key = make_key(chart_id, data['key'], data['generation'], template_key)
+    fig = figures.get(key)
+    if fig is None:
+        with phase('figure:' + chart_id):
+            fig = build_figure(chart_id, chart_data)
+        if chart_id in delta_charts:
+            # ключ выборки в фигуре: от него браузер применяет дельту точек
+            fig = dict(fig, layout=dict(fig['layout'], datarevision=data['key']))
+        figures.set(key, fig)
+    return fig
+
+
+def render_chart(chart_id, data, traces):
+    # график для уже устаревшего значения слайдера не строим
+    if LIVE_FILTER and not live_requests.is_current(data.get('session'), data.get('seq')):
+        raise PreventUpdate
+
+    chart_data = load_filtered(data)
 
     # WARINNG MESSAGE
 
     if len(chart_data) == 0:
-        # Если выбор пустой, то возвращаем предупреждение
-        return html.Div('Please select more data'), html.Div(), html.Div(), html.Div()
+        # Если выбор пустой, то вместо первого графика выводим предупреждение
+        message = 'Please select more data' if chart_id == 'dist-temp-chart' else None
+        return dash.no_update, dash.no_update, {'display': 'none'}, message
+
+    # (фигура, набор трейсов, стиль графика, предупреждение)
+    fig = cached_figure(chart_id, data, chart_data)
+    signature = trace_signature(fig)
+    if signature != traces:
+        # первый показ или другой набор трейсов: фигура целиком
+        return fig, signature, {}, None
+    # те же трейсы: заменяем только их массивы
+    return figure_patch(fig), dash.no_update, {}, None
+
+
+def live_chart(chart_id, data, traces, shown):
+    # то же, что render_chart, + дельта точек: если обе выборки (показанная
+    # в браузере и новая) есть в кэше, в браузер уходят только изменения
+    if not live_requests.is_current(data.get('session'), data.get('seq')):
+        raise PreventUpdate
+    previous = results.get(shown) if shown else None
+    current = results.get(data['key'])
+    if previous is not None and current is not None and len(current):
+        with phase('delta:' + chart_id):
+            delta = point_delta(previous, current, chart_columns[chart_id])
+        if delta is not None:
+            delta.update(base=shown, revision=data['key'])
+            return dash.no_update, dash.no_update, {}, None, delta
+    return render_chart(chart_id, data, traces) + (dash.no_update,)
+
+
+def chart_callback(chart_id):
+    # у каждого графика свой колбэк: браузер запрашивает их параллельно,
+    # сервер считает их в разных потоках, и график появляется сразу, как
+    # только готов, не дожидаясь самого медленного
+    outputs = [Output(component_id=chart_id + '-graph', component_property='figure'),
+               Output(component_id=chart_id + '-traces', component_property='data'),
+               Output(component_id=chart_id + '-body', component_property='style'),
+               Output(component_id=chart_id + '-message', component_property='children')]
+    states = [State(component_id=chart_id + '-traces', component_property='data')]
+    if chart_id in delta_charts:
+        outputs.append(Output(component_id=chart_id + '-delta', component_property='data'))
+        states.append(State(component_id=chart_id + '-shown', component_property='data'))
+
+    @ app.callback(outputs,
+                   [Input(component_id='filtered-data', component_property='data')],
+                   states)
+    def update_chart(data, traces, shown=None):
+        if chart_id in delta_charts:
+            return live_chart(chart_id, data, traces, shown)
+        return render_chart(chart_id, data, traces)
+
+    return update_chart
+
+
+def delta_callbacks(chart_id):
+    # дельту применяет браузер; ключ выборки в -shown берется из самой
+    # фигуры, поэтому сервер всегда считает дельту от того, что на экране
+    app.clientside_callback(
+        ClientsideFunction(namespace='exo', function_name='apply_delta'),
+        Output(component_id=chart_id + '-graph', component_property='figure',
+               allow_duplicate=True),
+        [Input(component_id=chart_id + '-delta', component_property='data')],
+        [State(component_id=chart_id + '-graph', component_property='figure')],
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='exo', function_name='shown_revision'),
+        Output(component_id=chart_id + '-shown', component_property='data'),
+        [Input(component_id=chart_id + '-graph', component_property='figure')]
+    )
 
-    # по x - Tplanet, по y - A, разбивка по цветам в зависимости от категории StarSize
-    fig1 = px.scatter(chart_data, x='TPLANET', y='A', color='StarSize',
-                      color_discrete_sequence=color_status_values)
-    fig1.update_layout(template=charts_template)
 
-    html1 = [html.H4('Planet Temperature ~ Distance from the Star'),  # название графика
-             dcc.Graph(figure=fig1)]  # второй элемент - списка график
+if CLIENTSIDE_FILTER:
+    # каталог уходит в браузер один раз за сессию (и после обновления данных)
+    @ app.callback(
+        Output(component_id='catalog-data', component_property='data'),
+        [Input(component_id='session-id', component_property='data')],
+        [State(component_id='catalog-data', component_property='data')]
+    )
+    def send_catalog(session_id, current):
+        # сравниваем отпечаток, а не номер поколения: номер свой в каждом
+        # воркере, и поколение N у разных воркеров - разные данные
+        _, df, _, fingerprint = state.snapshot()
+        if current and current.get('fingerprint') == fingerprint:
+            raise PreventUpdate
+        with phase('catalog_payload'):
+            return catalog_payload(df, client_columns, fingerprint)
+
+    # фильтр и обновление графиков - clientside-колбэки (assets/clientside.js)
+    for chart_id in charts:
+        app.clientside_callback(
+            ClientsideFunction(namespace='exo', function_name='filter_figure'),
+            Output(component_id=chart_id + '-graph', component_property='figure'),
+            [Input(component_id='catalog-data', component_property='data'),
+             Input(component_id='range-slider', component_property='value'),
+             Input(component_id='star-selector', component_property='value')],
+            [State(component_id=chart_id + '-graph', component_property='figure'),
+             State(component_id=chart_id + '-spec', component_property='data')]
+        )
+else:
+    for chart_id in charts:
+        chart_callback(chart_id)
+    for chart_id in delta_charts:
+        delta_callbacks(chart_id)
+
+
+# после новой выборки, сортировки или фильтра таблица открывается с первой страницы
+table_resets = {'filtered-data.data', 'raw-table.sort_by', 'raw-table.filter_query'}
 
-    fig2 = px.scatter(chart_data, x='RA', y='DEC', size='RPLANET',
-                      color='status',
-                      color_discrete_sequence=color_status_values)
-    fig2.update_layout(template=charts_template)
 
-    html2 = [html.H4('Position on the Celestial Sphere'),
-             dcc.Graph(figure=fig2)]
+@ app.callback(
+    [Output(component_id='raw-table-page', component_property='data'),
+     Output(component_id='raw-table', component_property='page_count'),
+     Output(component_id='raw-table', component_property='page_current')],
+    [Input(component_id='filtered-data', component_property='data'),
+     Input(component_id='raw-table', component_property='page_current'),
+     Input(component_id='raw-table', component_property='page_size'),
+     Input(component_id='raw-table', component_property='sort_by'),
+     Input(component_id='raw-table', component_property='filter_query'),
+     Input(component_id='tabs', component_property='active_tab')]
+)
+def update_table(data, page_current, page_size, sort_by, filter_query, active_tab):
+    # таблицу считаем, только когда открыта вкладка Data
+    if not data or active_tab != 'tab-data':
+        raise PreventUpdate
+    chart_data = load_filtered(data)
+    # отфильтрованный и отсортированный порядок строк кэшируем: листание
+    # страниц не пересчитывает фильтр и сортировку
+    key = make_key(data['key'], sort_by, filter_query)
+    positions = table_views.get(key)
+    if positions is None:
+        with phase('table_filter_sort'):
+            positions = sort_positions(chart_data,
+                                       filter_positions(chart_data, filter_query),
+                                       sort_by)
+        table_views.set(key, positions)
+    pages = page_count(positions, page_size)
+    if table_resets & set(dash.ctx.triggered_prop_ids):
+        page_current = 0
+    # страница не дальше последней (например, выборка сменилась, пока была
+    # открыта другая вкладка)
+    page_current = min(page_current or 0, pages - 1)
+    with phase('table_page'):
+        page = page_columns(chart_data, table_columns, page_current, page_size, positions)
+    return page, pages, page_current
+
+
+# страница приходит по колонкам, строки для DataTable собираются в браузере
+app.clientside_callback(
+    ClientsideFunction(namespace='exo', function_name='page_rows'),
+    Output(component_id='raw-table', component_property='data'),
+    [Input(component_id='raw-table-page', component_property='data')]
+)
+
+
+@ app.callback(
+    Output(component_id='about-content', component_property='children'),
+    [Input(component_id='tabs', component_property='active_tab')]
+)
+def render_about(active_tab):
+    if active_tab != 'tab-about':
+        raise PreventUpdate
+    return about_content()
 
-    # RELATIVE DISTANCE CHART
 
-    fig3 = px.histogram(chart_data, x='relative_dist',
-                        color='status', barmode='overlay', marginal='violin', color_discrete_sequence=color_status_values)
-    fig3.update_layout(template=charts_template)
-    fig3.add_vline(x=1, y0=0, y1=155, annotation_text='Earth',
-                   line_dash='dot')  # вертикальная линия (уровень Земли)
-    html3 = [html.H4('Relative Distance (AU/SOL radii'),
-             dcc.Graph(figure=fig3)]
-
-    fig4 = px.scatter(chart_data, x='MSTAR', y='TSTAR',
-                      size='RPLANET', color='status', color_discrete_sequence=color_status_values)
-    fig4.update_layout(template=charts_template)
-    html4 = [html.H4('Star Mass ~ Star Temperature'),
-             dcc.Graph(figure=fig4)]
-
-    # RAW DATA TABLE
-    # вывоидм наш датафрейм без указанных колонок
-    raw_data = chart_data.drop(
-        ['relative_dist', 'StarSize', 'ROW', 'temp', 'gravity'], axis=1)
-    tbl = dash_table.DataTable(data=raw_data.to_dict('records'),  # конвертируем в словарь
-                               columns=[{'name': i, 'id': i}
-                                        for i in raw_data.columns],
-                               style_data={'width': '100px',
-                                           'maxWidth': '100px',
-                                           'minWidth': '100px'},
-                               # Количество элементов (в нашем случае строк) на странице
-                               page_size=30,
-                               # Задаем стиль заголовка (выравниваем по центру)
-                               style_header={'textAlign': 'center'})
-
-    html5 = [html.H4('Raw Data'), tbl]
-
-    return html1, html2, html3, html4, html5
+# METRICS: время, CPU и размер ответа каждого колбэка (EXO_METRICS=1, /metrics)
+instrument(app)
+# HTTP: сжатие ответов (gzip/brotli) и кэширование ассетов
+tune_responses(app)
+# JSON: кодировщик ответов (EXO_JSON_ENCODER=fast - orjson, plotly - как в dash)
+use_encoder(app)
+lap('callbacks')
+# хронология запуска (EXO_STARTUP_PROFILE=1)
+report_startup()
 
 
 if __name__ == '__main__':
-    app.run_server(debug=True)  # debug = True - запуск в тестовом режиме
+    # сервер для разработки; для продакшена - gunicorn -c gunicorn.conf.py
+    start_background_tasks()
+    app.run(debug=True)  # debug = True - запуск в тестовом режиме (run_server в dash 3 убран)
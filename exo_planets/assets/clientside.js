@@ -0,0 +1,141 @@
+// CLIENTSIDE FILTER: фильтр по радиусу планеты и размеру звезды считается в
+// браузере по колоночной копии каталога (см. clientside.py), а у графиков
+// заменяются только массивы x / y / marker.size в трейсах
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    exo: {
+        filter_figure: function (catalog, radiusRange, starSize, figure, spec) {
+            if (!catalog || !figure || !radiusRange) {
+                return window.dash_clientside.no_update;
+            }
+            const cols = catalog.columns;
+            // значение ячейки; категории хранятся кодами
+            const label = function (name, i) {
+                const col = cols[name];
+                if (col.categories === undefined) {
+                    return col[i];
+                }
+                return col.codes[i] >= 0 ? col.categories[col.codes[i]] : null;
+            };
+            const pick = function (name, rows) {
+                return rows.map(function (i) { return label(name, i); });
+            };
+
+            // строки, прошедшие фильтр, сразу раскладываем по группам цвета
+            const sizes = new Set(starSize || []);
+            const rplanet = cols.RPLANET;
+            const groups = {};
+            for (let i = 0; i < catalog.length; i++) {
+                if (!(rplanet[i] > radiusRange[0] && rplanet[i] < radiusRange[1])) {
+                    continue;
+                }
+                if (!sizes.has(label('StarSize', i))) {
+                    continue;
+                }
+                const group = label(spec.color, i);
+                (groups[group] = groups[group] || []).push(i);
+            }
+
+            const data = figure.data.map(function (trace) {
+                if (trace.name === undefined) {
+                    return trace;
+                }
+                const rows = groups[trace.name] || [];
+                const updated = Object.assign({}, trace, {x: pick(spec.x, rows)});
+                if (spec.y && trace.y !== undefined) {
+                    updated.y = pick(spec.y, rows);
+                }
+                if (spec.size && trace.marker && trace.marker.size !== undefined) {
+                    updated.marker = Object.assign({}, trace.marker, {size: pick(spec.size, rows)});
+                }
+                return updated;
+            });
+            return Object.assign({}, figure, {data: data});
+        },
+
+        // LIVE DELTA: в live-режиме сервер присылает для скаттеров не трейсы, а
+        // изменения (charts.point_delta): номера убранных точек (remove), места
+        // добавленных точек в новом трейсе (insert) и их значения. Дельта
+        // считается от выборки base и применяется, только если график
+        // показывает именно ее
+        apply_delta: function (delta, figure) {
+            if (!delta || !figure || !figure.layout || figure.layout.datarevision !== delta.base) {
+                return window.dash_clientside.no_update;
+            }
+            const typed = {f4: Float32Array, f8: Float64Array, i1: Int8Array, u1: Uint8Array,
+                           i2: Int16Array, u2: Uint16Array, i4: Int32Array, u4: Uint32Array};
+            // массив трейса: список или base64-массив plotly ({dtype, bdata})
+            const values = function (array) {
+                if (array === undefined || array === null) {
+                    return [];
+                }
+                if (Array.isArray(array) || ArrayBuffer.isView(array)) {
+                    return array;
+                }
+                const bytes = Uint8Array.from(atob(array.bdata), function (c) {
+                    return c.charCodeAt(0);
+                });
+                return new typed[array.dtype](bytes.buffer);
+            };
+            const splice = function (shown, change, attr) {
+                const old = values(shown);
+                const remove = values(change.remove);
+                const insert = values(change.insert);
+                const added = values(change[attr]);
+                const result = new Array(old.length - remove.length + insert.length);
+                let r = 0, a = 0, s = 0;
+                for (let i = 0; i < result.length; i++) {
+                    if (a < insert.length && insert[a] === i) {
+                        result[i] = added[a++];
+                        continue;
+                    }
+                    while (r < remove.length && remove[r] === s) {
+                        r++;
+                        s++;
+                    }
+                    result[i] = old[s++];
+                }
+                return result;
+            };
+
+            const data = figure.data.map(function (trace, i) {
+                const change = delta.traces[i];
+                const updated = Object.assign({}, trace, {x: splice(trace.x, change, 'x'),
+                                                          y: splice(trace.y, change, 'y')});
+                if (change.size !== undefined) {
+                    updated.marker = Object.assign({}, trace.marker, {
+                        size: splice(trace.marker.size, change, 'size'),
+                        sizeref: change.sizeref
+                    });
+                }
+                return updated;
+            });
+            const layout = Object.assign({}, figure.layout, {datarevision: delta.revision});
+            return Object.assign({}, figure, {data: data, layout: layout});
+        },
+
+        // ключ выборки, которую показывает график (для следующей дельты)
+        shown_revision: function (figure) {
+            if (!figure || !figure.layout || figure.layout.datarevision === undefined) {
+                return null;
+            }
+            return figure.layout.datarevision;
+        },
+
+        // TABLE PAGE: страница таблицы приходит по колонкам (datatable.page_columns),
+        // DataTable нужен список строк
+        page_rows: function (page) {
+            if (!page) {
+                return window.dash_clientside.no_update;
+            }
+            const rows = [];
+            for (let i = 0; i < page.length; i++) {
+                const row = {};
+                page.columns.forEach(function (col, j) {
+                    row[col] = page.data[j][i];
+                });
+                rows.push(row);
+            }
+            return rows;
+        }
+    }
+});
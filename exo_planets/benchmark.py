@@ -0,0 +1,201 @@
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+# BENCHMARK (замер конвейера данных и колбэков на синтетическом каталоге)
+# сеть не нужна: app.py при импорте читает свежий синтетический снимок из
+# временной папки. Запуск: python benchmark.py --sizes 2000,100000 --repeat 3
+os.environ['EXO_SNAPSHOT_DIR'] = tempfile.mkdtemp(prefix='exo-bench-')
+atexit.register(shutil.rmtree, os.environ['EXO_SNAPSHOT_DIR'], ignore_errors=True)
+os.environ.pop('EXO_SHARED_DIR', None)
+os.environ.pop('EXO_RESULT_CACHE_DIR', None)
+
+import numpy as np
+import pandas as pd
+import plotly
+
+from catalog import API_PAGE_SIZE, SNAPSHOT_VERSION, build_catalog, write_snapshot
+
+SIZES = [2000, 10000, 100000, 1000000, 10000000]
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'results.jsonl')
+
+
+def synthetic_catalog(n, seed=0):
+    # сырой каталог с колонками и распределениями как у asterank/kepler
+    rng = np.random.default_rng(seed)
+    raw = pd.DataFrame({
+        'KOI': np.round(rng.uniform(1, 5000, n), 2),
+        'A': rng.lognormal(-2.5, 1, n),
+        'RPLANET': rng.lognormal(0.8, 0.8, n),
+        'RSTAR': rng.lognormal(0, 0.3, n),
+        'TSTAR': rng.normal(5600, 800, n),
+        'KMAG': rng.normal(13, 1, n),
+        'TPLANET': rng.lognormal(6.5, 0.6, n),
+        'T0': rng.uniform(130, 600, n),
+        'UT0': rng.uniform(0, 0.01, n),
+        'PER': rng.lognormal(2.5, 1.2, n),
+        'UPER': rng.uniform(0, 1e-3, n),
+        'DEC': rng.uniform(36, 52, n),
+        'RA': rng.uniform(280, 302, n),
+        'MSTAR': rng.lognormal(0, 0.2, n),
+        'DEPTH': rng.uniform(10, 3000, n),
+        'UDEPTH': rng.uniform(0, 50, n),
+        'DUR': rng.uniform(1, 10, n),
+        'UDUR': rng.uniform(0, 1, n),
+        'INC': rng.uniform(80, 90, n),
+        'ROW': np.arange(n),
+    })
+    # как в настоящем каталоге: несколько точек с отрицательным периодом
+    # и пропуски в температуре
+    raw.loc[rng.random(n) < 0.001, 'PER'] = -1
+    raw.loc[rng.random(n) < 0.01, 'TPLANET'] = np.nan
+    return raw
+
+
+def timed(func, repeat):
+    # лучшее время из repeat запусков и результат последнего
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def peak_memory(func):
+    # пик памяти, выделенной за время вызова (numpy/pandas тоже учитываются)
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def load_pages(raw):
+    # разбор ответа API постранично, как в fetch_catalog; время генерации
+    # JSON страницы не учитывается
+    elapsed, chunks = 0, []
+    for lo in range(0, len(raw), API_PAGE_SIZE):
+        text = raw.iloc[lo: lo + API_PAGE_SIZE].to_json(orient='records')
+        start = time.perf_counter()
+        chunks.append(pd.DataFrame.from_records(json.loads(text)))
+        elapsed += time.perf_counter() - start
+    start = time.perf_counter()
+    df = pd.concat(chunks, ignore_index=True)
+    return elapsed + time.perf_counter() - start, df
+
+
+def bench_size(app, n, repeat):
+    from datatable import filter_positions, page_columns, sort_positions
+    from encoder import encode
+
+    def to_json(value):
+        # тем же кодировщиком, что и ответы колбэков этого приложения
+        return encode(app.app.server, value, html=False)
+
+    raw = synthetic_catalog(n)
+    stages = {}
+
+    def record(name, func, seconds=None, **extra):
+        if seconds is None:
+            seconds, result = timed(func, repeat)
+        else:
+            result = None
+        stages[name] = dict(seconds=seconds, peak_bytes=peak_memory(func), **extra)
+        return result
+
+    load_seconds, _ = load_pages(raw)
+    record('load', lambda: load_pages(raw), seconds=load_seconds)
+    df = record('build_catalog', lambda: build_catalog(raw))
+    record('swap_index', lambda: app.state.swap(df))
+
+    radius_range, star_size = [0, 100], list(app.names)
+    chart_data = record('select_data', lambda: app.select_data(radius_range, star_size))
+    # filter_data кэширует выборку: перед каждым запуском кэш очищается, чтобы
+    # замер был промахом, а не чтением из памяти (очистка - доли микросекунды)
+    data = record('filter_data',
+                  lambda: (app.results.clear(), app.filter_data(1, radius_range, star_size, None))[1])
+    record('store_roundtrip', lambda: json.loads(to_json(data)), bytes=len(to_json(data)))
+
+    for chart_id in app.charts:
+        record('figure:' + chart_id, lambda: app.build_figure(chart_id, chart_data))
+        fig = app.build_figure(chart_id, chart_data)
+        record('figure_json:' + chart_id, lambda: to_json(fig), bytes=len(to_json(fig)))
+
+    sort_by = [{'column_id': 'RPLANET', 'direction': 'desc'}]
+    positions = record('table_filter_sort', lambda: sort_positions(
+        chart_data, filter_positions(chart_data, '{RPLANET} > 1'), sort_by))
+    record('table_page', lambda: page_columns(chart_data, app.table_columns, 0, 30, positions))
+    return {'rows': n, 'catalog_rows': len(df), 'selected_rows': len(chart_data), 'stages': stages}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(path, revision):
+    # последний сохраненный прогон другой ревизии - с ним сравниваем
+    try:
+        with open(path) as f:
+            runs = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return None
+    runs = [run for run in runs if run.get('revision') != revision]
+    return runs[-1] if runs else None
+
+
+def report(run, baseline):
+    base = {r['rows']: r['stages'] for r in baseline['results']} if baseline else {}
+    if baseline:
+        print('compared with {} ({})'.format(baseline['revision'], baseline['time']))
+    for result in run['results']:
+        print('\nrows={rows} catalog={catalog_rows} selected={selected_rows}'.format(**result))
+        for name, stage in result['stages'].items():
+            line = '  {:<32} {:>10.4f}s {:>10.1f}MB'.format(
+                name, stage['seconds'], stage['peak_bytes'] / 2 ** 20)
+            if 'bytes' in stage:
+                line += ' {:>10}B'.format(stage['bytes'])
+            old = base.get(result['rows'], {}).get(name)
+            if old and old['seconds']:
+                line += ' {:+7.1%}'.format(stage['seconds'] / old['seconds'] - 1)
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='exo_planets pipeline benchmark')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in SIZES[:4]),
+                        help='row counts, comma separated (up to {})'.format(SIZES[-1]))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=RESULTS)
+    args = parser.parse_args()
+
+    # свежий синтетический снимок: app.py загрузит его вместо сети
+    sizes = [int(n) for n in args.sizes.split(',')]
+    write_snapshot(synthetic_catalog(sizes[0]), {'version': SNAPSHOT_VERSION,
+                                                 'fetched_at': time.time()})
+    import app
+
+    revision = git_revision()
+    run = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': revision,
+           'python': platform.python_version(), 'pandas': pd.__version__,
+           'numpy': np.__version__, 'plotly': plotly.__version__, 'repeat': args.repeat,
+           'results': [bench_size(app, n, args.repeat) for n in sizes]}
+    report(run, previous_run(args.output, revision))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'a') as f:
+        f.write(json.dumps(run) + '\n')
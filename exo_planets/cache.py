@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def make_key(*parts):
+    # короткий стабильный ключ из любых json-сериализуемых значений
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class LRUCache:
+    # ограниченный по числу записей кэш в памяти процесса; при переполнении
+    # вытесняется запись, к которой дольше всего не обращались
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResultCache(LRUCache):
+    # отфильтрованные датафреймы: LRU в памяти и, если задан каталог,
+    # parquet-файлы на диске - их видят все воркеры на этой машине. Файлы
+    # нужны и другим воркерам, поэтому при вытеснении из памяти их не
+    # удаляем: на диске хранится не больше disk_maxsize последних выборок
+
+    def __init__(self, maxsize=32, directory=None, disk_maxsize=256):
+        super().__init__(maxsize)
+        self.directory = directory
+        self.disk_maxsize = disk_maxsize
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.parquet')
+
+    def get(self, key, default=None):
+        value = super().get(key)
+        if value is not None or not self.directory:
+            return default if value is None else value
+        path = self._path(key)
+        try:
+            value = pd.read_parquet(path)
+            os.utime(path)  # время изменения - время последнего обращения
+        except (OSError, ValueError, ImportError):
+            return default
+        super().set(key, value)
+        return value
+
+    def _trim(self):
+        # удаляем самые давние файлы сверх disk_maxsize
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.parquet'):
+                path = os.path.join(self.directory, name)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass  # файл уже удалил другой воркер
+        for _, path in sorted(files)[:max(0, len(files) - self.disk_maxsize)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def set(self, key, value):
+        super().set(key, value)
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            value.to_parquet(path + '.tmp')
+            os.replace(path + '.tmp', path)
+            self._trim()
+        except (OSError, ImportError):
+            pass  # диск - только дополнительный уровень кэша
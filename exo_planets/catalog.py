@@ -0,0 +1,497 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from classify import LookupClassifier
+from filters import FilterIndex
+from startup import lazy_import
+
+# клиент API нужен, только когда снимок на диске устарел (EXO_LAZY_IMPORTS=1)
+requests = lazy_import('requests')
+
+logger = logging.getLogger(__name__)
+
+# адрес API можно переопределить (например, на локальный stub-сервер)
+API_URL = os.environ.get('EXO_API_URL', 'http://asterank.com/api/kepler')
+API_LIMIT = int(os.environ.get('EXO_API_LIMIT', 0))  # 0 - весь каталог
+API_TIMEOUT = float(os.environ.get('EXO_API_TIMEOUT', 10))
+# каталог читаем страницами по диапазонам ROW, несколько страниц параллельно
+API_PAGE_SIZE = int(os.environ.get('EXO_API_PAGE_SIZE', 2000))
+API_WORKERS = int(os.environ.get('EXO_API_WORKERS', 4))
+# предохранитель: больше страниц за одну загрузку не запрашиваем
+API_MAX_PAGES = int(os.environ.get('EXO_API_MAX_PAGES', 1000))
+# DELTA SYNC: при обновлении качаются и пересчитываются только изменившиеся
+# страницы каталога (см. DeltaCatalog)
+DELTA_SYNC = os.environ.get('EXO_DELTA_SYNC', '0') == '1'
+
+# период фонового обновления каталога (по умолчанию совпадает с TTL снимка)
+REFRESH_INTERVAL = float(os.environ.get('EXO_REFRESH_INTERVAL',
+                                        os.environ.get('EXO_SNAPSHOT_TTL', 24 * 60 * 60)))
+
+# SNAPSHOT CACHE (локальный снимок каталога на диске)
+SNAPSHOT_DIR = os.environ.get(
+    'EXO_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots'))
+SNAPSHOT_TTL = float(os.environ.get('EXO_SNAPSHOT_TTL', 24 * 60 * 60))  # в секундах
+# при изменении формата снимка увеличиваем версию - старые файлы игнорируются
+SNAPSHOT_VERSION = 2
+
+
+def _snapshot_paths():
+    base = os.path.join(SNAPSHOT_DIR, 'kepler_v{}'.format(SNAPSHOT_VERSION))
+    return base + '.parquet', base + '.json'
+
+
+def _get_page(session, page, headers=None):
+    # страница - это диапазон ROW [page * size, (page + 1) * size); запрос по
+    # диапазону (а не по смещению) позволяет качать страницы независимо
+    lo = page * API_PAGE_SIZE
+    query = {'ROW': {'$gte': lo, '$lt': lo + API_PAGE_SIZE}}
+    response = session.get(API_URL,
+                           params={'query': json.dumps(query), 'limit': API_PAGE_SIZE},
+                           headers=headers, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response
+
+
+def _parse_page(response):
+    # разбираем страницу сразу в типизированные колонки: список словарей
+    # живет только до конца этой функции, а не до конца загрузки
+    return pd.DataFrame.from_records(response.json())
+
+
+def _in_window(chunk, page):
+    # все строки страницы из запрошенного диапазона ROW. Если нет - API
+    # игнорирует запрос по ROW и отдает одни и те же первые строки
+    lo = page * API_PAGE_SIZE
+    return not len(chunk) or ('ROW' in chunk and
+                              chunk['ROW'].between(lo, lo + API_PAGE_SIZE - 1).all())
+
+
+def fetch_catalog(headers=None):
+    # считываем каталог с asterank.com. Условные заголовки отправляются с
+    # первой страницей: при 304 возвращаем (None, response), иначе
+    # (датафрейм, ответ). Ответ (с его ETag/Last-Modified) возвращается, только
+    # если каталог пришел одним ответом: 304 на первую страницу ничего не
+    # говорит об остальных, для них - None (постраничная проверка - EXO_DELTA_SYNC)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=API_WORKERS)
+    with requests.Session() as session, ThreadPoolExecutor(API_WORKERS) as pool:
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        first = _get_page(session, 0, headers)
+        if first.status_code == 304:
+            return None, first
+        chunks = [_parse_page(first)]
+        # API без поддержки запросов по ROW вернет весь ответ одной страницей
+        paged = _in_window(chunks[0], 0)
+        single = not paged
+        rows = len(chunks[0])
+
+        page = 1
+        while paged and not (API_LIMIT and rows >= API_LIMIT):
+            if page >= API_MAX_PAGES:
+                logger.warning('catalog truncated at EXO_API_MAX_PAGES=%d pages', API_MAX_PAGES)
+                break
+            numbers = range(page, min(page + API_WORKERS, API_MAX_PAGES))
+            wave = list(pool.map(lambda i: _parse_page(_get_page(session, i)), numbers))
+            page = numbers.stop
+            loaded = 0
+            for number, chunk in zip(numbers, wave):
+                if not _in_window(chunk, number):
+                    # API учел limit, но не запрос по ROW: дальше те же строки
+                    logger.warning('API ignores ROW range queries, page %d and later skipped',
+                                   number)
+                    paged = False
+                    break
+                chunks.append(chunk)
+                loaded += len(chunk)
+            if paged and not loaded:  # целая волна пустых страниц - каталог закончился
+                break
+            rows += loaded
+
+    # склеиваем один раз в конце
+    df = pd.concat(chunks, ignore_index=True)
+    if API_LIMIT:
+        df = df.iloc[:API_LIMIT]
+    return df, first if single else None
+
+
+def read_snapshot():
+    data_path, meta_path = _snapshot_paths()
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('version') != SNAPSHOT_VERSION:
+            return None, None
+        return pd.read_parquet(data_path), meta
+    except (OSError, ValueError, ImportError):
+        # снимка нет, он поврежден или pyarrow не установлен
+        return None, None
+
+
+def write_snapshot(df, meta):
+    data_path, meta_path = _snapshot_paths()
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        # пишем во временные файлы и подменяем атомарно, чтобы параллельно
+        # стартующие воркеры не прочитали недописанный снимок
+        df.to_parquet(data_path + '.tmp', index=False)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(data_path + '.tmp', data_path)
+        os.replace(meta_path + '.tmp', meta_path)
+    except (OSError, ImportError):
+        pass  # кэш - оптимизация, без него приложение продолжает работать
+
+
+def _touch_snapshot(meta):
+    _, meta_path = _snapshot_paths()
+    meta['fetched_at'] = time.time()
+    try:
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+    except OSError:
+        pass
+
+
+def load_catalog(max_age=None):
+    # 1. свежий снимок (моложе TTL) читаем с диска без обращения к сети
+    # 2. устаревший снимок обновляем: каталог, пришедший одним ответом, -
+    #    условным запросом (If-None-Match / If-Modified-Since), 304 - продлеваем
+    #    снимок; постраничный каталог качаем заново и перезаписываем
+    # 3. если API недоступно - работаем на устаревшем снимке
+    max_age = SNAPSHOT_TTL if max_age is None else max_age
+    df, meta = read_snapshot()
+    if df is not None and time.time() - meta.get('fetched_at', 0) < max_age:
+        return df
+
+    headers = {}
+    if meta is not None and meta.get('single_response'):
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    try:
+        fresh, response = fetch_catalog(headers)
+        if fresh is None and df is not None:  # 304 - снимок не устарел
+            _touch_snapshot(meta)
+            return df
+    except (requests.RequestException, ValueError):
+        if df is not None:
+            return df
+        raise
+
+    # валидаторы сохраняем только у каталога, пришедшего одним ответом
+    validators = response.headers if response is not None else {}
+    write_snapshot(fresh, {'version': SNAPSHOT_VERSION,
+                           'fetched_at': time.time(),
+                           'single_response': response is not None,
+                           'etag': validators.get('ETag'),
+                           'last_modified': validators.get('Last-Modified'),
+                           'rows': len(fresh)})
+    return fresh
+
+
+# FEATURES (производные колонки каталога)
+
+# Create Star size category
+# разбиваем на категории по метрикам сравнения с метриками солнце
+bins = [0, 0.8, 1.2, 100]
+names = ['small', 'similar', 'bigger']
+
+# TEMPERATURE BINS (бакеты по температуре планет)
+tp_bins = [0, 200, 400, 500, 5000]
+tp_labels = ['low', 'optimal', 'high', 'extreme']
+
+#  SIZE_BINS (бакеты по размерам планеты в зависимости от радиуса Земли)
+rp_bins = [0, 0.5, 2, 4, 100]
+rp_labels = ['low', 'optimal', 'high', 'extreme']  # лейблы по бакетам
+
+#  ESTIMATE OBJECT STATUS (статус объекта по паре бакетов temp x gravity)
+statuses = ['promising', 'challening', 'extreme']
+#  В остальных случаях значение extreme
+status_rules = (LookupClassifier(tp_labels, rp_labels, statuses, default='extreme')
+                #  Если temp == optimal и gravity == optimal => promising
+                .rule(['optimal'], ['optimal'], 'promising')
+                #  Если и не optimal, и не extreme, то challening для нас
+                .rule(['optimal'], ['low', 'high'], 'challening')
+                .rule(['low', 'high'], ['optimal'], 'challening'))
+
+# SCHEMA (компактные типы колонок каталога)
+# float32 (~7 значащих цифр) - для физических величин и их погрешностей;
+# координаты, эпоха и период, где важны младшие разряды, остаются float64;
+# целые - минимальной ширины, если все значения целые; производные метки - категории
+schema = {
+    'KOI': 'integer', 'ROW': 'integer',
+    'RA': 'float64', 'DEC': 'float64', 'T0': 'float64', 'PER': 'float64',
+    'A': 'float32', 'RPLANET': 'float32', 'RSTAR': 'float32', 'TSTAR': 'float32',
+    'MSTAR': 'float32', 'TPLANET': 'float32', 'KMAG': 'float32', 'INC': 'float32',
+    'DEPTH': 'float32', 'DUR': 'float32', 'UT0': 'float32', 'UPER': 'float32',
+    'UDEPTH': 'float32', 'UDUR': 'float32', 'relative_dist': 'float32',
+    'StarSize': 'category', 'temp': 'category', 'gravity': 'category',
+    'status': 'category'
+}
+
+
+def apply_schema(df):
+    for col, kind in schema.items():
+        if col not in df:
+            continue
+        if kind == 'integer':
+            values = pd.to_numeric(df[col], errors='coerce')
+            # с пропусками или дробными значениями (KOI 1.01 и 1.02 - разные
+            # объекты) колонку оставляем float64
+            if values.notna().all() and (values % 1 == 0).all():
+                df[col] = pd.to_numeric(values.astype('int64'), downcast='integer')
+            else:
+                df[col] = values.astype('float64')
+        elif kind == 'category':
+            df[col] = df[col].astype('category')
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(kind)
+    return df
+
+
+def memory_report(df):
+    # память по колонкам (deep - с учетом строк в object-колонках)
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str),
+                           'bytes': usage,
+                           'share': usage / usage.sum()})
+    report.loc['total'] = ['', usage.sum(), 1.0]
+    return report
+
+
+def short_floats(values):
+    # float32 -> короткая десятичная запись (0.3, а не 0.30000001192092896)
+    # для данных, которые уходят в браузер как JSON
+    if values.dtype == 'float32':
+        return values.astype(str).astype('float64')
+    return values
+
+
+def build_catalog(raw):
+    df = raw[raw['PER'] > 0].copy()  # отрезаем нежелательную точку с периодом < 0
+
+    df['StarSize'] = pd.cut(df['RSTAR'], bins, labels=names)
+    # Разбиваем температуру по бинам + в зависимости от этого лейбл
+    df['temp'] = pd.cut(df['TPLANET'], tp_bins, labels=tp_labels)
+    # по аналогии делаем соответствие по радиусам
+    df['gravity'] = pd.cut(df['RPLANET'], rp_bins, labels=rp_labels)
+
+    #  ESTIMATE OBJECT STATUS (разбиваем объекты по статусам)
+    df['status'] = status_rules.classify(df['temp'], df['gravity'])
+
+    # Relative distnacer (distance to SUN/SUM radius)
+    df.loc[:, 'relative_dist'] = df['A']/df['RSTAR']
+    # типы сужаем после расчета бакетов, чтобы границы бинов считались точно
+    return apply_schema(df)
+
+
+# DELTA SYNC
+
+def _fetch_page(session, page, known=None):
+    # (страница, датафрейм или None, если не изменилась, {'hash', 'etag'}).
+    # Страница проверяется своим ETag (304), а если API его не поддерживает -
+    # хэшем содержимого: неизменившаяся страница не разбирается
+    headers = {'If-None-Match': known['etag']} if known and known.get('etag') else None
+    response = _get_page(session, page, headers)
+    if response.status_code == 304:
+        return page, None, known
+    info = {'hash': hashlib.sha1(response.content).hexdigest(),
+            'etag': response.headers.get('ETag')}
+    if known and known['hash'] == info['hash']:
+        return page, None, info
+    chunk = _parse_page(response)
+    if not _in_window(chunk, page):
+        raise ValueError('EXO_DELTA_SYNC requires an API with ROW range queries')
+    return page, chunk, info
+
+
+def _page_of(rows):
+    return rows.to_numpy() // API_PAGE_SIZE
+
+
+class DeltaCatalog:
+    # сырой каталог, готовый датафрейм и сведения о страницах (диапазонах ROW).
+    # При синхронизации известные страницы перепроверяются, за последней
+    # известной (водяной знак) докачиваются новые; строки изменившихся страниц
+    # заменяются целиком (так же уходят и удаленные записи), признаки
+    # считаются только для них. API_LIMIT в этом режиме не применяется
+
+    def __init__(self):
+        self.raw = None
+        self.df = None
+        self.pages = {}  # номер страницы -> {'hash', 'etag'}
+
+    def load(self):
+        # снимок на диске - отправная точка: при рестарте качается только разница
+        raw, meta = read_snapshot()
+        if raw is not None:
+            self.raw, self.df = raw, build_catalog(raw)
+            self.pages = {int(page): info for page, info in meta.get('pages', {}).items()}
+            if time.time() - meta.get('fetched_at', 0) < SNAPSHOT_TTL:
+                return self.df
+        try:
+            self.sync()
+        except (requests.RequestException, ValueError):
+            if self.df is None:
+                raise
+        return self.df
+
+    def build(self):
+        # готовый датафрейм после синхронизации (для общего каталога)
+        if self.df is None:
+            return self.load()
+        self.sync()
+        return self.df
+
+    def refresh(self):
+        # новый датафрейм или None, если каталог не изменился
+        return self.df if self.sync() else None
+
+    def sync(self):
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=API_WORKERS)
+        with requests.Session() as session, ThreadPoolExecutor(API_WORKERS) as pool:
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            known = sorted(self.pages)
+            results = list(pool.map(lambda page: _fetch_page(session, page, self.pages[page]),
+                                    known))
+            page = known[-1] + 1 if known else 0
+            while True:
+                wave = list(pool.map(lambda i: _fetch_page(session, i),
+                                     range(page, page + API_WORKERS)))
+                page += API_WORKERS
+                wave = [result for result in wave if len(result[1])]
+                if not wave:  # целая волна пустых страниц - каталог закончился
+                    break
+                results.extend(wave)
+
+        changed = {}
+        for page, chunk, info in results:
+            if chunk is not None:
+                changed[page] = chunk
+            if chunk is not None and len(chunk) == 0:
+                self.pages.pop(page, None)  # страница опустела
+            else:
+                self.pages[page] = info
+        meta = {'version': SNAPSHOT_VERSION, 'fetched_at': time.time(),
+                'pages': {str(page): info for page, info in self.pages.items()}}
+        if not changed:
+            _touch_snapshot(meta)
+            return False
+
+        fresh = [chunk for chunk in changed.values() if len(chunk)]
+        fresh = pd.concat(fresh, ignore_index=True) if fresh else self.raw.iloc[:0]
+        if self.raw is None:
+            self.raw, self.df = fresh, build_catalog(fresh)
+        else:
+            pages = list(changed)
+            self.raw = pd.concat([self.raw[~np.isin(_page_of(self.raw['ROW']), pages)], fresh],
+                                 ignore_index=True).sort_values('ROW', ignore_index=True)
+            self.df = pd.concat([self.df[~np.isin(_page_of(self.df['ROW']), pages)],
+                                 build_catalog(fresh)],
+                                ignore_index=True).sort_values('ROW', ignore_index=True)
+        meta['rows'] = len(self.raw)
+        write_snapshot(self.raw, meta)
+        return True
+
+
+# BACKGROUND REFRESH
+
+def frame_fingerprint(df):
+    # отпечаток содержимого датафрейма: одинаковые данные - одинаковый
+    # отпечаток в любом процессе (в отличие от номера поколения)
+    digest = hashlib.sha1(json.dumps([list(map(str, df.columns)),
+                                      list(map(str, df.dtypes))]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+class CatalogState:
+    # номер поколения, датафрейм и его индекс фильтра хранятся одним кортежем:
+    # присваивание атрибута атомарно, поэтому читатели никогда не увидят
+    # новый датафрейм со старым номером поколения или индексом (и наоборот)
+
+    def __init__(self, df, loader=None):
+        self._current = (0, df, FilterIndex(df), frame_fingerprint(df))
+        # loader возвращает новый датафрейм или None, если данные не менялись
+        self.loader = loader or self._reload
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def df(self):
+        return self._current[1]
+
+    @property
+    def generation(self):
+        return self._current[0]
+
+    @property
+    def index(self):
+        return self._current[2]
+
+    @property
+    def fingerprint(self):
+        return self._current[3]
+
+    def snapshot(self):
+        # (поколение, датафрейм, индекс, отпечаток) - согласованные между собой
+        return self._current
+
+    def swap(self, df, fingerprint=None):
+        # индекс и отпечаток считаем до подмены, вне блокировки
+        index = FilterIndex(df)
+        fingerprint = fingerprint or frame_fingerprint(df)
+        with self._lock:
+            self._current = (self._current[0] + 1, df, index, fingerprint)
+        return self._current[0]
+
+    def _reload(self):
+        return build_catalog(load_catalog(max_age=REFRESH_INTERVAL))
+
+    def refresh(self):
+        # загрузка и расчет признаков идут вне запросов; подменяем только
+        # готовый датафрейм. После 304, повторного чтения того же снимка или
+        # сегмента с теми же данными они прежние: новое поколение сбросило бы
+        # индекс и все кэши выборок и фигур, поэтому сравниваем отпечатки
+        df = self.loader()
+        if df is None:
+            return
+        fingerprint = frame_fingerprint(df)
+        if fingerprint != self.fingerprint:
+            self.swap(df, fingerprint)
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+            except Exception:  # обновление не должно остановить поток
+                # оставляем текущее поколение до следующей попытки
+                logger.exception('catalog refresh failed')
+
+    def start_refresh(self, interval=None):
+        interval = REFRESH_INTERVAL if interval is None else interval
+        # после fork поток родителя в дочернем процессе уже не работает
+        if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, args=(interval,),
+                                        name='catalog-refresh', daemon=True)
+        self._thread.start()
+
+
+if __name__ == '__main__':
+    # python catalog.py - отчет по памяти, которую занимает каталог в воркере
+    print(memory_report(build_catalog(load_catalog())))
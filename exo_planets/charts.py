@@ -0,0 +1,291 @@
+import base64
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from dash import Patch
+from plotly.subplots import make_subplots
+
+# RENDERING THRESHOLDS
+# выше этого числа точек скаттер рисуется через WebGL (Scattergl), а не SVG
+WEBGL_THRESHOLD = int(os.environ.get('EXO_WEBGL_THRESHOLD', 1000))
+# выше этого числа точек данные прореживаются на сервере
+DOWNSAMPLE_THRESHOLD = int(os.environ.get('EXO_DOWNSAMPLE_THRESHOLD', 50000))
+# 'sample' - выборка с сохранением плотности, 'heatmap' - 2D-гистограмма
+DOWNSAMPLE_MODE = os.environ.get('EXO_DOWNSAMPLE_MODE', 'sample')
+DOWNSAMPLE_BINS = int(os.environ.get('EXO_DOWNSAMPLE_BINS', 100))
+# выше этого числа строк гистограмма и violin-маргинал считаются на сервере:
+# в браузер уходят счетчики бинов и сетка плотности, а не сырые значения
+AGGREGATE_THRESHOLD = int(os.environ.get('EXO_AGGREGATE_THRESHOLD', 0))
+HISTOGRAM_BINS = int(os.environ.get('EXO_HISTOGRAM_BINS', 50))
+KDE_POINTS = int(os.environ.get('EXO_KDE_POINTS', 200))
+# live-режим: если изменилась большая доля точек, фигура уходит целиком
+DELTA_MAX_SHARE = float(os.environ.get('EXO_DELTA_MAX_SHARE', 0.5))
+
+
+def render_mode(n):
+    return 'webgl' if n > WEBGL_THRESHOLD else 'svg'
+
+
+def needs_downsampling(n):
+    return n > DOWNSAMPLE_THRESHOLD
+
+
+def needs_aggregation(n):
+    return n > AGGREGATE_THRESHOLD
+
+
+def downsample(frame, by, max_points=None):
+    # равномерная выборка внутри каждой группы: плотность точек и доли групп
+    # сохраняются, редкие группы (promising) не пропадают целиком.
+    # Выборка детерминированная, поэтому фигуры можно кэшировать
+    max_points = DOWNSAMPLE_THRESHOLD if max_points is None else max_points
+    if len(frame) <= max_points:
+        return frame
+    rng = np.random.default_rng(0)
+    codes = frame[by].astype('category').cat.codes.to_numpy()
+    keep = np.zeros(len(frame), dtype=bool)
+    for code in np.unique(codes):
+        rows = np.flatnonzero(codes == code)
+        size = max(1, int(round(len(rows) * max_points / len(frame))))
+        keep[rng.choice(rows, size=min(size, len(rows)), replace=False)] = True
+    return frame[keep]  # исходный порядок строк сохраняется
+
+
+def binned_heatmap(frame, x, y, bins=None):
+    # 2D-гистограмма, посчитанная на сервере: в браузер уходит bins x bins
+    # чисел независимо от количества строк
+    bins = DOWNSAMPLE_BINS if bins is None else bins
+    data = frame[[x, y]].dropna()
+    counts, x_edges, y_edges = np.histogram2d(data[x].to_numpy(), data[y].to_numpy(),
+                                              bins=bins)
+    fig = go.Figure(go.Heatmap(x=(x_edges[:-1] + x_edges[1:]) / 2,
+                               y=(y_edges[:-1] + y_edges[1:]) / 2,
+                               z=np.where(counts.T > 0, counts.T, np.nan),
+                               colorscale='Blues', colorbar=dict(title='count')))
+    fig.update_layout(xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def kde_summary(values, points=None):
+    # квартили и гауссова KDE на равномерной сетке. Ширина окна - правило
+    # Сильвермана (как у violin в plotly.js); значения раскладываются по
+    # бинам сетки, и ядро сворачивается с гистограммой: O(n + сетка^2)
+    points = KDE_POINTS if points is None else points
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    spread = min(values.std(), (q3 - q1) / 1.349) or values.std()
+    bandwidth = max(1.059 * spread * len(values) ** -0.2, 1e-9)
+    grid = np.linspace(values.min() - 2 * bandwidth, values.max() + 2 * bandwidth, points)
+    step = grid[1] - grid[0]
+    counts, _ = np.histogram(values, bins=points, range=(grid[0] - step / 2, grid[-1] + step / 2))
+    radius = min(int(np.ceil(4 * bandwidth / step)), points)  # ядро режем на 4 сигмах
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) * step / bandwidth) ** 2)
+    density = np.convolve(counts, kernel)[radius: radius + points]
+    density = density / (len(values) * bandwidth * np.sqrt(2 * np.pi))
+    return {'q1': q1, 'median': median, 'q3': q3, 'grid': grid, 'density': density}
+
+
+def histogram_figure(x, color):
+    # макет гистограммы с violin-маргиналом (как у px.histogram(...,
+    # marginal='violin')): сверху violin, снизу столбцы. Трейсы для него
+    # дают histogram_traces; макет не зависит от данных и собирается один раз
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.25, 0.75],
+                        vertical_spacing=0.01)
+    fig.update_layout(barmode='overlay', legend_title_text=color)
+    fig.update_xaxes(title_text=x, row=2, col=1)
+    fig.update_yaxes(title_text='count', row=2, col=1)
+    fig.update_yaxes(showticklabels=False, showgrid=False, row=1, col=1)
+    return fig
+
+
+def histogram_traces(frame, x, color, colors, bins=None):
+    # трейсы для histogram_figure из агрегатов: столбцы - счетчики по общим
+    # бинам, violin - контур KDE и квартили. Размер не зависит от числа строк
+    bins = HISTOGRAM_BINS if bins is None else bins
+    data = frame[[x, color]].dropna()
+    edges = np.histogram_bin_edges(data[x].to_numpy('float64'), bins=bins)
+    centers = typed_array((edges[:-1] + edges[1:]) / 2)
+    traces = []
+    for i, (group, rows) in enumerate(group_rows(data[color])):
+        values = data[x].to_numpy('float64')[rows]
+        group_color = colors[i % len(colors)]
+        counts, _ = np.histogram(values, bins=edges)
+        traces.append({'hovertemplate': '{}={}<br>{}=%{{x}}<br>count=%{{y}}<extra></extra>'.format(
+                           color, group, x),
+                       'legendgroup': group, 'marker': {'color': group_color}, 'name': group,
+                       'width': float(edges[1] - edges[0]), 'x': centers, 'y': typed_array(counts),
+                       'type': 'bar', 'xaxis': 'x2', 'yaxis': 'y2'})
+
+        kde = kde_summary(values)
+        half_width = 0.4 * kde['density'] / kde['density'].max()
+        traces.append({'fill': 'toself', 'hoverinfo': 'skip', 'legendgroup': group,
+                       'line': {'color': group_color, 'width': 1}, 'mode': 'lines',
+                       'showlegend': False,
+                       'x': typed_array(np.concatenate([kde['grid'], kde['grid'][::-1]])),
+                       'y': typed_array(np.concatenate([i + half_width, (i - half_width)[::-1]])),
+                       'type': 'scatter', 'xaxis': 'x', 'yaxis': 'y'})
+        traces.append({'hovertemplate': '{}={}<br>%{{text}}=%{{x}}<extra></extra>'.format(color, group),
+                       'legendgroup': group, 'line': {'color': group_color, 'width': 4},
+                       'marker': {'color': 'white'}, 'mode': 'lines+markers', 'showlegend': False,
+                       'text': ['q1', 'median', 'q3'],
+                       'x': [float(kde['q1']), float(kde['median']), float(kde['q3'])],
+                       'y': [i, i, i], 'type': 'scatter', 'xaxis': 'x', 'yaxis': 'y'})
+    return traces
+
+
+# BINARY TRANSPORT
+# numpy-массивы трейсов plotly отдает в браузер base64-типизированными
+# массивами ({'dtype', 'bdata'}), а не списками чисел. Перед этим сужаем
+# типы: float64 -> float32, целые - до самого узкого типа. Для точки на
+# графике точности float32 хватает, а ответ и время кодирования меньше вдвое
+trace_arrays = ('x', 'y', 'z', 'customdata')
+
+
+def compact_array(values):
+    if not isinstance(values, np.ndarray) or len(values) == 0:
+        return values
+    if values.dtype == 'float64':
+        return values.astype('float32')
+    if values.dtype.kind in 'iu':
+        return pd.to_numeric(values, downcast='integer')
+    return values
+
+
+def compact_figure(fig):
+    for trace in fig.data:
+        for attr in trace_arrays:
+            if attr in trace and isinstance(trace[attr], np.ndarray):
+                trace[attr] = compact_array(trace[attr])
+        if 'marker' in trace and 'size' in trace.marker and isinstance(trace.marker.size, np.ndarray):
+            trace.marker.size = compact_array(trace.marker.size)
+    return fig
+
+
+# LEAN FIGURES
+# фигуры-словари без plotly.express и валидаторов plotly: строки группируются
+# по кодам категории, массивы сразу кодируются base64 (тем же форматом, что у
+# plotly). Результат совпадает с px.scatter(...) после compact_figure
+typed_array_dtypes = {'float32': 'f4', 'float64': 'f8', 'int8': 'i1', 'uint8': 'u1',
+                      'int16': 'i2', 'uint16': 'u2', 'int32': 'i4', 'uint32': 'u4'}
+
+
+def typed_array(values):
+    values = compact_array(np.asarray(values))
+    dtype = typed_array_dtypes.get(str(values.dtype))
+    if dtype is None:
+        return values.tolist()
+    return {'dtype': dtype, 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def group_rows(values):
+    # (группа, номера строк) в порядке появления групп, как у px. Строки без
+    # группы px не рисует, но цвет им назначает - для них группа None
+    values = values.astype('category')
+    codes, categories = values.cat.codes.to_numpy(), values.cat.categories
+    present, first = np.unique(codes, return_index=True)
+    for code in present[np.argsort(first)]:
+        group = str(categories[code]) if code >= 0 else None
+        yield group, np.flatnonzero(codes == code)
+
+
+def scatter_traces(frame, x, y, color, colors, size=None, render_mode='svg', size_max=20):
+    # то же, что px.scatter(frame, x, y, color=color, size=size, ...).data
+    xs, ys = frame[x].to_numpy(), frame[y].to_numpy()
+    if size:
+        sizes = frame[size].to_numpy()
+        sizeref = float(frame[size].max()) / size_max ** 2
+    traces = []
+    for i, (group, rows) in enumerate(group_rows(frame[color])):
+        if group is None:
+            continue
+        hover = '{}={}<br>{}=%{{x}}<br>{}=%{{y}}'.format(color, group, x, y)
+        marker = {'color': colors[i % len(colors)]}
+        if size:
+            hover += '<br>{}=%{{marker.size}}'.format(size)
+            marker.update(size=typed_array(sizes[rows]), sizemode='area', sizeref=sizeref)
+        marker['symbol'] = 'circle'
+        trace = {'hovertemplate': hover + '<extra></extra>', 'legendgroup': group, 'marker': marker,
+                 'mode': 'markers', 'name': group}
+        if render_mode == 'svg':
+            trace['orientation'] = 'v'
+        trace.update({'showlegend': True, 'x': typed_array(xs[rows]), 'xaxis': 'x',
+                      'y': typed_array(ys[rows]), 'yaxis': 'y',
+                      'type': 'scattergl' if render_mode == 'webgl' else 'scatter'})
+        traces.append(trace)
+    return traces
+
+
+def scatter_layout(x, y, color, size=None):
+    # макет px.scatter без шаблона
+    legend = {'title': {'text': color}, 'tracegroupgap': 0}
+    if size:
+        legend['itemsizing'] = 'constant'
+    return {'xaxis': {'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': x}},
+            'yaxis': {'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': y}},
+            'legend': legend, 'margin': {'t': 60}}
+
+
+# FIGURE PATCH
+# график в браузере живет постоянно; если набор трейсов (тип + имя) не
+# изменился, в браузер уходят только их массивы, без layout и шаблона
+patch_arrays = ('x', 'y', 'z', 'width')
+
+
+def trace_signature(fig):
+    return [[trace.get('type'), trace.get('name')] for trace in fig['data']]
+
+
+def figure_patch(fig):
+    patch = Patch()
+    for i, trace in enumerate(fig['data']):
+        for attr in patch_arrays:
+            if attr in trace:
+                patch['data'][i][attr] = trace[attr]
+        for attr in ('size', 'sizeref'):  # sizeref px считает по максимуму size
+            if attr in trace.get('marker', {}):
+                patch['data'][i]['marker'][attr] = trace['marker'][attr]
+    if 'datarevision' in fig['layout']:
+        patch['layout']['datarevision'] = fig['layout']['datarevision']
+    return patch
+
+
+# POINT DELTA
+# в live-режиме соседние значения слайдера дают почти одинаковые выборки:
+# вместо массивов трейсов в браузер уходят номера убранных точек и
+# добавленные точки с их местами в новом трейсе (применяет apply_delta в
+# assets/clientside.js). Точка - строка каталога (метка индекса), точки в
+# трейсе идут в порядке строк, как у scatter_traces
+
+
+def point_delta(previous, current, spec, size_max=20):
+    # дельта от трейсов scatter_traces(previous) к трейсам scatter_traces(current)
+    # или None, если набор трейсов другой или изменилась большая доля точек
+    if (needs_downsampling(len(previous)) or needs_downsampling(len(current))
+            or render_mode(len(previous)) != render_mode(len(current))):
+        return None
+    shown = [(group, previous.index[rows]) for group, rows in group_rows(previous[spec['color']])
+             if group is not None]
+    fresh = [(group, rows) for group, rows in group_rows(current[spec['color']])
+             if group is not None]
+    if [group for group, _ in shown] != [group for group, _ in fresh]:
+        return None
+
+    columns = {attr: current[spec[attr]].to_numpy() for attr in ('x', 'y', 'size') if attr in spec}
+    traces, changed = [], 0
+    for (_, labels), (_, rows) in zip(shown, fresh):
+        present = np.isin(labels, current.index[rows])
+        added = np.flatnonzero(~np.isin(current.index[rows], labels))
+        changed += len(labels) - present.sum() + len(added)
+        trace = {'remove': typed_array(np.flatnonzero(~present)), 'insert': typed_array(added)}
+        for attr, values in columns.items():
+            trace[attr] = typed_array(values[rows[added]])
+        traces.append(trace)
+    if changed > DELTA_MAX_SHARE * len(current):
+        return None
+    if 'size' in spec:
+        # sizeref, как в scatter_traces, зависит от максимума по всей выборке
+        sizeref = float(current[spec['size']].max()) / size_max ** 2
+        for trace in traces:
+            trace['sizeref'] = sizeref
+    return {'traces': traces}
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+
+class LookupClassifier:
+    # классификация по двум категориальным колонкам через таблицу поиска:
+    # правило (строки x колонки -> класс) заполняет ячейки таблицы один раз,
+    # а сама классификация - одна выборка table[коды1, коды2] за O(n)
+    # без промежуточных масок на каждое правило
+
+    def __init__(self, row_labels, col_labels, classes, default):
+        self.row_labels = list(row_labels)
+        self.col_labels = list(col_labels)
+        self.classes = list(classes)
+        # лишняя последняя строка/колонка - для пропусков: код NaN равен -1,
+        # и индекс -1 попадает как раз в нее (там остается значение по умолчанию)
+        self.table = np.full((len(self.row_labels) + 1, len(self.col_labels) + 1),
+                             self.classes.index(default), dtype=np.int8)
+
+    def rule(self, rows, cols, label):
+        # правила применяются по порядку: более позднее перекрывает ранее заданное
+        r = [self.row_labels.index(i) for i in rows]
+        c = [self.col_labels.index(i) for i in cols]
+        self.table[np.ix_(r, c)] = self.classes.index(label)
+        return self
+
+    @staticmethod
+    def _codes(values, labels):
+        values = pd.Series(values)
+        if isinstance(values.dtype, pd.CategoricalDtype) \
+                and list(values.cat.categories) == labels:
+            return values.cat.codes.to_numpy()  # готовые коды, без сравнения строк
+        return pd.Categorical(values, categories=labels).codes
+
+    def classify(self, row_values, col_values):
+        codes = self.table[self._codes(row_values, self.row_labels),
+                           self._codes(col_values, self.col_labels)]
+        return pd.Categorical.from_codes(codes, categories=self.classes)
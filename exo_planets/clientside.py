@@ -0,0 +1,27 @@
+import os
+
+import pandas as pd
+
+from catalog import short_floats
+
+# CLIENTSIDE FILTER (фильтрация графиков в браузере, без запросов к серверу)
+CLIENTSIDE_FILTER = os.environ.get('EXO_CLIENTSIDE_FILTER', '0') == '1'
+
+
+def catalog_payload(df, columns, fingerprint):
+    # компактная колоночная копия каталога для браузера: числа - списками,
+    # категории - кодами + словарем категорий (строки не повторяются).
+    # fingerprint - отпечаток данных: по нему браузер не качает каталог заново
+    payload = {'fingerprint': fingerprint, 'length': len(df), 'columns': {}}
+    for col in columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            payload['columns'][col] = {'categories': list(values.cat.categories),
+                                       'codes': values.cat.codes.to_numpy()}
+        elif values.dtype == object:
+            codes, categories = pd.factorize(values)
+            payload['columns'][col] = {'categories': list(categories),
+                                       'codes': codes}
+        else:
+            payload['columns'][col] = short_floats(values).to_numpy()
+    return payload
@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+
+from catalog import short_floats
+
+# операторы filter_query, которые формирует dash_table в режиме filter_action='custom'
+operators = [['ge ', '>='],
+             ['le ', '<='],
+             ['lt ', '<'],
+             ['gt ', '>'],
+             ['ne ', '!='],
+             ['eq ', '='],
+             ['contains '],
+             ['datestartswith ']]
+
+
+def split_filter_part(filter_part):
+    # '{KOI} > 100' -> ('KOI', 'gt', 100)
+    for operator_type in operators:
+        for operator in operator_type:
+            if operator not in filter_part:
+                continue
+            name_part, value_part = filter_part.split(operator, 1)
+            name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+            value_part = value_part.strip()
+            v0 = value_part[0] if value_part else ''
+            if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                value = value_part[1: -1].replace('\\' + v0, v0)
+            else:
+                try:
+                    value = float(value_part)
+                except ValueError:
+                    value = value_part
+
+            return name, operator_type[0].strip(), value
+    return None, None, None
+
+
+def filter_positions(frame, filter_query):
+    # позиции строк, прошедших фильтр таблицы (без копирования фрейма)
+    mask = np.ones(len(frame), dtype=bool)
+    for filter_part in (filter_query or '').split(' && '):
+        col_name, operator, filter_value = split_filter_part(filter_part)
+        if col_name not in frame:
+            continue
+        column = frame[col_name]
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            try:
+                mask &= getattr(column, operator)(filter_value).to_numpy(dtype=bool)
+            except (TypeError, ValueError):
+                # текст в числовой колонке или сравнение неупорядоченных
+                # категорий - такое условие пропускаем, как неизвестную колонку
+                continue
+        elif operator == 'contains':
+            mask &= column.astype(str).str.contains(str(filter_value), regex=False).to_numpy(dtype=bool)
+        elif operator == 'datestartswith':
+            mask &= column.astype(str).str.startswith(str(filter_value)).to_numpy(dtype=bool)
+    return np.flatnonzero(mask)
+
+
+def sort_positions(frame, positions, sort_by):
+    if not sort_by or not len(positions):
+        return positions
+    cols = [col['column_id'] for col in sort_by]
+    keys = frame[cols].iloc[positions].reset_index(drop=True)
+    keys = keys.sort_values(cols, ascending=[col['direction'] == 'asc' for col in sort_by],
+                            kind='stable', na_position='last')
+    return positions[keys.index.to_numpy()]
+
+
+def page_columns(frame, columns, page_current, page_size, positions):
+    # в браузер уходит только текущая страница, по колонкам: имена колонок
+    # не повторяются в каждой строке (строки собирает assets/clientside.js).
+    # Колонки уходят массивами - их кодирует encoder.py
+    start = (page_current or 0) * page_size
+    page = frame.iloc[positions[start: start + page_size]]
+    return {'columns': columns, 'length': len(page),
+            'data': [short_floats(page[col]).to_numpy() for col in columns]}
+
+
+def page_count(positions, page_size):
+    return max(1, math.ceil(len(positions) / page_size))
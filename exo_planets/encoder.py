@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pandas as pd
+from flask import current_app, has_app_context, has_request_context, request
+from plotly.io.json import to_json_plotly
+
+try:
+    import orjson
+except ImportError:  # без orjson ответы кодирует стандартный кодировщик plotly
+    orjson = None
+
+# JSON ENCODER (кодирование ответов колбэков и макета)
+# fast - orjson, массивы numpy и колонки pandas кодируются целиком за один
+# проход, без списков python; plotly - стандартный путь dash (to_json_plotly)
+JSON_ENCODER = os.environ.get('EXO_JSON_ENCODER', 'fast')
+json_encoders = ('fast', 'plotly')
+
+# те же замены, что делает plotly, - для JSON, который встраивается в <script>
+# страницы. Ответы API (/_dash-*) браузер разбирает JSON.parse, им замены не
+# нужны: base64-массивы фигур полны '/', каждый из которых стал бы 6 байтами
+html_safe = ((b'<', b'\\u003c'), (b'>', b'\\u003e'), (b'/', b'\\u002f'),
+             (b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def plain_values(values):
+    # колонка pandas или массив numpy -> то, что orjson кодирует сам
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # значения берем из словаря категорий по кодам
+        values = pd.Categorical(values)
+        categories = np.asarray(plain_values(values.categories), dtype=object)
+        codes = values.codes
+        return np.where(codes >= 0, categories[codes.clip(0)], None).tolist()
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        return np.ascontiguousarray(values)
+    if values.dtype.kind == 'M':
+        missing = np.isnat(values)
+        if not missing.any():
+            return np.ascontiguousarray(values)
+        # NaT orjson не кодирует - как у plotly, пропуск становится null
+        return [None if nat else pd.Timestamp(v).isoformat() for v, nat in zip(values, missing)]
+    return values.tolist()
+
+
+def default(obj):
+    # все, что orjson не умеет сам; вызывается только для таких значений
+    if hasattr(obj, 'to_plotly_json'):  # фигуры, Patch, компоненты dash
+        return obj.to_plotly_json()
+    if isinstance(obj, (np.ndarray, pd.Series, pd.Index)):
+        return plain_values(obj)
+    if obj is pd.NaT or obj is pd.NA or obj is np.ma.masked:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('Type is not JSON serializable: ' + type(obj).__name__)
+
+
+def dumps(value, html=True):
+    data = orjson.dumps(value, default=default,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    if html:
+        for unsafe, safe in html_safe:
+            if unsafe in data:
+                data = data.replace(unsafe, safe)
+    return data.decode('utf8')
+
+
+def encode(server, value, html=True):
+    if server.config.get('EXO_JSON_ENCODER') == 'fast':
+        return dumps(value, html)
+    return to_json_plotly(value)
+
+
+def to_json(value):
+    # кодировщик выбирается по приложению, которое обрабатывает запрос;
+    # приложения без use_encoder (другие Dash в том же процессе) кодируются как раньше
+    if not has_app_context():
+        return to_json_plotly(value)
+    prefix = current_app.config.get('EXO_JSON_API_PREFIX')
+    if prefix is None:
+        return to_json_plotly(value)
+    html = not (has_request_context() and request.path.startswith(prefix))
+    return encode(current_app, value, html)
+
+
+def use_encoder(app, name=JSON_ENCODER):
+    # dash импортирует to_json из dash._utils в свои модули по имени, поэтому
+    # подменяем его везде; старый путь остается для приложений без 'fast'
+    if name not in json_encoders:
+        raise ValueError('EXO_JSON_ENCODER must be one of {}'.format(json_encoders))
+    if name == 'fast' and orjson is None:
+        name = 'plotly'
+    app.server.config['EXO_JSON_ENCODER'] = name
+    app.server.config['EXO_JSON_API_PREFIX'] = app.config.routes_pathname_prefix + '_dash-'
+    import dash._callback
+    import dash._utils
+    import dash._validate
+    import dash.dash
+    for module in (dash._callback, dash._utils, dash._validate, dash.dash):
+        module.to_json = to_json
+    return name
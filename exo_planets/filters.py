@@ -0,0 +1,30 @@
+import numpy as np
+
+
+class FilterIndex:
+    # индекс для фильтра "радиус планеты в диапазоне + размер звезды":
+    # строится один раз на поколение каталога, запрос - два searchsorted по
+    # отсортированному RPLANET и выборка по кодам StarSize только внутри
+    # найденного диапазона, т.е. O(log n + k) вместо трех масок на весь фрейм
+
+    def __init__(self, df, value_col='RPLANET', category_col='StarSize'):
+        values = df[value_col].to_numpy(dtype=np.float64)
+        self.order = np.argsort(values, kind='stable')  # перестановка строк
+        self.sorted_values = values[self.order]  # NaN уходят в конец
+        categories = df[category_col].cat
+        self.categories = list(categories.categories)
+        # коды категорий в порядке сортировки - по ним строится битовая маска
+        self.sorted_codes = categories.codes.to_numpy()[self.order]
+
+    def query(self, lo, hi, selected):
+        # строго lo < value < hi, как в исходном фильтре
+        start = np.searchsorted(self.sorted_values, lo, side='right')
+        stop = np.searchsorted(self.sorted_values, hi, side='left')
+        # маска разрешенных категорий; последний элемент - для кода -1 (NaN)
+        allowed = np.zeros(len(self.categories) + 1, dtype=bool)
+        for name in selected or []:
+            if name in self.categories:
+                allowed[self.categories.index(name)] = True
+        rows = self.order[start:stop][allowed[self.sorted_codes[start:stop]]]
+        rows.sort()  # сохраняем исходный порядок строк для графиков
+        return rows
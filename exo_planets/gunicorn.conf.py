@@ -0,0 +1,38 @@
+# Конфигурация gunicorn для exo_planets: gunicorn -c gunicorn.conf.py
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:application'
+bind = os.environ.get('EXO_BIND', '0.0.0.0:8050')
+
+# данные и layout загружаются один раз в мастере, воркеры получают их через fork
+preload_app = True
+
+# процессы x потоки: колбэки графиков выполняются параллельно в потоках воркера
+workers = int(os.environ.get('EXO_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('EXO_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('EXO_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('EXO_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# периодический перезапуск воркеров ограничивает рост памяти
+max_requests = int(os.environ.get('EXO_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+
+def post_fork(server, worker):
+    # потоки мастера не переживают fork - фоновое обновление запускаем в воркере
+    from app import start_background_tasks
+    start_background_tasks()
+
+
+def on_reload(server):
+    # kill -HUP <master>: мастер перечитывает каталог (снимок на диске или API),
+    # затем gunicorn плавно заменяет воркеров - новые стартуют со свежими
+    # данными, старые дорабатывают текущие запросы
+    from app import state
+    try:
+        state.refresh()
+    except Exception:  # при ошибке воркеры перезапустятся на прежних данных
+        server.log.exception('catalog reload failed')
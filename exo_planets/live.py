@@ -0,0 +1,39 @@
+import os
+import threading
+import time
+
+from cache import LRUCache
+
+# LIVE FILTER (фильтрация прямо во время перетаскивания слайдера)
+LIVE_FILTER = os.environ.get('EXO_LIVE_FILTER', '0') == '1'
+# пауза перед расчетом: если за это время пришло новое значение слайдера,
+# текущий запрос отбрасывается, не начав работу
+LIVE_DEBOUNCE = float(os.environ.get('EXO_LIVE_DEBOUNCE', 0.15))
+
+
+class LatestRequests:
+    # метка последнего запроса для каждой сессии браузера. Более новый запрос
+    # той же сессии делает все предыдущие устаревшими: они проверяют
+    # is_current() перед тяжелыми шагами и завершаются без результата.
+    # Учет ведется внутри процесса, метка - время запроса в микросекундах:
+    # она сравнима и с метками других воркеров. Метка уходит в браузер через
+    # dcc.Store, а JS хранит числа как double: она должна быть меньше 2**53
+    # (в наносекундах ~1.8e18 - браузер вернул бы ее округленной). Воркер
+    # отбрасывает только запросы, про которые знает, что они устарели; запрос
+    # сессии, которую он не видел (ее filter_data обработал другой воркер),
+    # актуален
+
+    def __init__(self, maxsize=10000):
+        self._seq = LRUCache(maxsize)
+        self._lock = threading.Lock()
+
+    def begin(self, session):
+        with self._lock:
+            # метки одной сессии в одном процессе строго возрастают
+            seq = max(time.time_ns() // 1000, self._seq.get(session, 0) + 1)
+            self._seq.set(session, seq)
+        return seq
+
+    def is_current(self, session, seq):
+        latest = self._seq.get(session)
+        return latest is None or seq is None or seq >= latest
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# METRICS (время и размер ответов колбэков, экспорт в формате Prometheus)
+METRICS = os.environ.get('EXO_METRICS', '0') == '1'
+# путь к файлу, куда по строке json пишется каждый вызов колбэка
+METRICS_LOG = os.environ.get('EXO_METRICS_LOG')
+
+seconds_buckets = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+bytes_buckets = [1000, 10000, 50000, 100000, 500000, 1000000, 5000000, 10000000]
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = defaultdict(lambda: [[0] * len(self.buckets), 0, 0.0])
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, _, _ = series = self._series[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = ['# HELP {} {}'.format(self.name, self.help_text),
+                 '# TYPE {} histogram'.format(self.name)]
+        with self._lock:
+            for key, (counts, count, total) in sorted(self._series.items()):
+                labels = ','.join('{}="{}"'.format(k, v) for k, v in key)
+                sep = ',' if labels else ''
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append('{}_bucket{{{}{}le="{}"}} {}'.format(
+                        self.name, labels, sep, bound, bucket_count))
+                lines.append('{}_bucket{{{}{}le="+Inf"}} {}'.format(self.name, labels, sep, count))
+                lines.append('{}_sum{{{}}} {}'.format(self.name, labels, total))
+                lines.append('{}_count{{{}}} {}'.format(self.name, labels, count))
+        return '\n'.join(lines)
+
+
+callback_seconds = Histogram('exo_callback_seconds',
+                             'Wall time of a Dash callback', seconds_buckets)
+callback_cpu_seconds = Histogram('exo_callback_cpu_seconds',
+                                 'CPU time of a Dash callback (thread)', seconds_buckets)
+output_bytes = Histogram('exo_callback_output_bytes',
+                         'JSON size of one callback output', bytes_buckets)
+phase_seconds = Histogram('exo_phase_seconds',
+                          'Wall time of a step inside a callback', seconds_buckets)
+
+# фазы текущего колбэка (колбэк выполняется целиком в одном потоке)
+_current = threading.local()
+_log_lock = threading.Lock()
+
+
+@contextmanager
+def phase(name):
+    # замер шага внутри колбэка: фильтр, построение фигуры, to_dict и т.д.
+    if not METRICS:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        phase_seconds.observe(elapsed, phase=name)
+        phases = getattr(_current, 'phases', None)
+        if phases is not None:
+            phases[name] = phases.get(name, 0) + elapsed
+
+
+def _output_sizes(callback_id, response):
+    # размер каждого Output; для колбэка с одним выходом - весь ответ.
+    # Ответ не разбираем заново: dash кодирует его компактно, как
+    # {"multi":true,"response":{"<id>":{"<prop>":<значение>},...}}, поэтому
+    # начало значения ищем по ключу, а конец - по началу следующего выхода
+    if '..' not in callback_id:
+        return {callback_id: len(response)}
+    found = []  # (начало ключа, начало значения, выход)
+    opened = {}  # компонент -> конец его последнего найденного ключа
+    for output in callback_id.strip('.').split('...'):
+        component, _, prop = output.rpartition('.')
+        prop = prop.partition('@')[0]  # у allow_duplicate к свойству добавлен @хэш
+        if component in opened:
+            # свойства одного компонента лежат в одном объекте
+            marker = ',{}:'.format(json.dumps(prop))
+            start = response.find(marker, opened[component])
+        else:
+            marker = '{}:{{{}:'.format(json.dumps(component), json.dumps(prop))
+            start = response.find(marker)
+        if start < 0:
+            continue  # no_update - выхода нет в ответе
+        opened[component] = start + len(marker)
+        found.append((start, start + len(marker), output))
+    if not found:
+        return {callback_id: len(response)}
+    found.sort()
+    # ответ заканчивается на }}} (или на }},"sideUpdate":{...}})
+    side = response.rfind(',"sideUpdate":')
+    end = (side if side >= 0 else len(response) - 1) - 2
+    sizes = {}
+    for i, (_, start, output) in enumerate(found):
+        if i + 1 == len(found):
+            stop = end
+        else:
+            # перед ключом следующего компонента стоит '},'
+            next_key = found[i + 1][0]
+            stop = next_key if response[next_key] == ',' else next_key - 2
+        sizes[output] = stop - start
+    return sizes
+
+
+def timed_callback(callback_id, func):
+    def wrapper(*args, **kwargs):
+        _current.phases = {}
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            response = func(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            phases, _current.phases = _current.phases, None
+            callback_seconds.observe(wall, callback=callback_id)
+            callback_cpu_seconds.observe(cpu, callback=callback_id)
+        sizes = _output_sizes(callback_id, response) if isinstance(response, str) else {}
+        for output, size in sizes.items():
+            output_bytes.observe(size, callback=callback_id, output=output)
+        if METRICS_LOG:
+            record = {'time': time.time(), 'callback': callback_id, 'wall': wall,
+                      'cpu': cpu, 'output_bytes': sizes, 'phases': phases}
+            with _log_lock, open(METRICS_LOG, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return response
+    return wrapper
+
+
+def render_metrics():
+    return '\n'.join(h.render() for h in (callback_seconds, callback_cpu_seconds,
+                                          output_bytes, phase_seconds)) + '\n'
+
+
+def instrument(app):
+    # оборачиваем все зарегистрированные колбэки (вызывать после их
+    # регистрации) и добавляем /metrics. Метрики считаются в каждом
+    # процессе отдельно - при нескольких воркерах это метрики одного из них
+    if not METRICS:
+        return
+    for callback_id, callback in app.callback_map.items():
+        if 'callback' not in callback:
+            continue  # clientside-колбэк выполняется в браузере
+        callback['callback'] = timed_callback(callback_id, callback['callback'])
+
+    @app.server.route('/metrics')
+    def metrics_endpoint():
+        return render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
@@ -0,0 +1,99 @@
+import gzip
+import os
+
+from flask import request
+
+from cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # без brotli ответы сжимаются только gzip
+    brotli = None
+
+# RESPONSE COMPRESSION (сжатие ответов колбэков, макета и скриптов)
+COMPRESS = os.environ.get('EXO_COMPRESS', '1') == '1'
+# ответы меньше этого размера (в байтах) не сжимаем: выигрыш меньше затрат
+COMPRESS_MIN_SIZE = int(os.environ.get('EXO_COMPRESS_MIN_SIZE', 1024))
+COMPRESS_LEVEL = int(os.environ.get('EXO_COMPRESS_LEVEL', 6))  # gzip, 1-9
+BROTLI_QUALITY = int(os.environ.get('EXO_BROTLI_QUALITY', 5))  # 0-11
+compress_types = {'application/json', 'text/html', 'text/css', 'text/javascript',
+                  'application/javascript', 'image/svg+xml'}
+
+# STATIC CACHE: адреса ассетов с отпечатком (?m=<время изменения файла>)
+# браузер кэширует навсегда, остальные перепроверяет по ETag
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+# сжатые неизменяемые файлы (ассеты, скрипты dash) сжимаем один раз
+compressed = LRUCache(maxsize=64)
+
+
+def asset_url(app, path):
+    # адрес ассета с отпечатком, как у css/js, которые dash подключает сам
+    modified = os.path.getmtime(os.path.join(app.config.assets_folder, path))
+    return '{}?m={}'.format(app.get_asset_url(path), modified)
+
+
+def choose_encoding():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def cache_headers(response, assets_prefix):
+    if request.path.startswith(assets_prefix):
+        if 'm' in request.args:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = ASSET_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+    elif response.cache_control.max_age == ASSET_MAX_AGE:
+        # скрипты компонентов dash с версией в адресе
+        response.cache_control.immutable = True
+
+
+def compress_response(response):
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in compress_types):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    key = (request.full_path, encoding)
+    body = compressed.get(key) if response.cache_control.immutable else None
+    if body is None:
+        body = compress_body(data, encoding)
+        if response.cache_control.immutable:
+            compressed.set(key, body)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, _ = response.get_etag()
+    if etag:
+        # у сжатого представления свой, слабый ETag (как делает nginx);
+        # If-None-Match сравнивается по слабому правилу, 304 продолжает работать
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def tune_responses(app):
+    assets_prefix = app.get_asset_url('')
+
+    @app.server.after_request
+    def tune_response(response):
+        cache_headers(response, assets_prefix)
+        return compress_response(response) if COMPRESS else response
@@ -0,0 +1,140 @@
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow нужен только в режиме общего каталога
+    pa = None
+
+from catalog import frame_fingerprint
+
+# SHARED CATALOG (один каталог на все воркеры машины)
+# готовый датафрейм публикуется в Arrow IPC файл (лучше в tmpfs, /dev/shm),
+# воркеры отображают его в память (mmap) без копирования; current.json
+# указывает на последний опубликованный сегмент
+SHARED_DIR = os.environ.get('EXO_SHARED_DIR')
+# как часто воркер проверяет, не опубликован ли новый сегмент
+SHARED_POLL_INTERVAL = float(os.environ.get('EXO_SHARED_POLL_INTERVAL', 30))
+
+
+def _path(name):
+    return os.path.join(SHARED_DIR, name)
+
+
+def read_pointer():
+    try:
+        with open(_path('current.json')) as f:
+            pointer = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return pointer if os.path.exists(_path(pointer['name'])) else None
+
+
+def _is_fresh(pointer, max_age):
+    # max_age <= 0 - обновление выключено, опубликованный сегмент не устаревает
+    return pointer is not None and (max_age <= 0 or
+                                    time.time() - pointer['published_at'] < max_age)
+
+
+def _write_pointer(pointer):
+    with open(_path('current.json.tmp'), 'w') as f:
+        json.dump(pointer, f)
+    os.replace(_path('current.json.tmp'), _path('current.json'))
+
+
+@contextmanager
+def publish_lock(blocking=True):
+    # публикует только один воркер; остальные ждут (или, при фоновом
+    # обновлении, просто пропускают свою очередь)
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    with open(_path('publish.lock'), 'w') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def publish(df, fingerprint=None):
+    previous = read_pointer()
+    name = 'catalog-{}.arrow'.format(time.time_ns())
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(_path(name + '.tmp'), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(_path(name + '.tmp'), _path(name))
+    _write_pointer({'name': name, 'published_at': time.time(), 'fingerprint': fingerprint})
+
+    # старые сегменты удаляем; воркеры, которые их еще отображают, продолжают
+    # работать - файл исчезнет после закрытия последнего отображения
+    keep = {name, previous['name'] if previous else None}
+    for old in os.listdir(SHARED_DIR):
+        if old.startswith('catalog-') and old.endswith('.arrow') and old not in keep:
+            try:
+                os.remove(_path(old))
+            except OSError:
+                pass
+    return name
+
+
+def attach(name):
+    # числовые колонки без пропусков остаются видами на отображенный файл
+    source = pa.memory_map(_path(name), 'r')
+    table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+class SharedCatalog:
+    # воркер-сторона общего каталога: знает, к какому сегменту подключен,
+    # и при обновлении переключается на новый
+
+    def __init__(self, build, max_age):
+        if pa is None:
+            raise ImportError('EXO_SHARED_DIR requires pyarrow')
+        self.build = build  # функция, которая строит готовый датафрейм
+        self.max_age = max_age
+        self.name = None
+
+    def load(self):
+        pointer = read_pointer()
+        if not _is_fresh(pointer, self.max_age):
+            with publish_lock():
+                # пока ждали блокировку, сегмент мог опубликовать другой воркер
+                pointer = read_pointer()
+                if not _is_fresh(pointer, self.max_age):
+                    pointer = self._publish(pointer)
+        self.name = pointer['name']
+        return attach(self.name)
+
+    def _publish(self, pointer):
+        # те же данные не публикуем заново: продлеваем указатель, и воркеры
+        # остаются на уже отображенном сегменте (и на своем поколении)
+        df = self.build()
+        fingerprint = frame_fingerprint(df)
+        if pointer is not None and pointer.get('fingerprint') == fingerprint:
+            pointer = dict(pointer, published_at=time.time())
+            _write_pointer(pointer)
+            return pointer
+        return {'name': publish(df, fingerprint)}
+
+    def refresh(self):
+        # новый датафрейм или None, если подключенный сегмент актуален
+        pointer = read_pointer()
+        if not _is_fresh(pointer, self.max_age):
+            with publish_lock(blocking=False) as acquired:
+                if not acquired:
+                    return None  # сегмент уже строит другой воркер
+                pointer = read_pointer()
+                if not _is_fresh(pointer, self.max_age):
+                    pointer = self._publish(pointer)
+        if pointer['name'] == self.name:
+            return None
+        self.name = pointer['name']
+        return attach(self.name)
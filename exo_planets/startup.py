@@ -0,0 +1,116 @@
+import builtins
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+
+# STARTUP PROFILE (из чего складывается запуск приложения и воркера)
+# EXO_STARTUP_PROFILE=1 - после импорта app.py в stderr печатается хронология
+# запуска (импорты, загрузка каталога, расчет колонок, layout, колбэки) и
+# самые медленные импорты; EXO_STARTUP_LOG - файл, куда отчет дописывается json
+STARTUP_PROFILE = os.environ.get('EXO_STARTUP_PROFILE', '0') == '1'
+STARTUP_LOG = os.environ.get('EXO_STARTUP_LOG')
+# LAZY IMPORTS: модули, которые нужны не при каждом запуске (plotly.express,
+# клиент API), загружаются при первом обращении к ним
+LAZY_IMPORTS = os.environ.get('EXO_LAZY_IMPORTS', '0') == '1'
+# SKIP JUPYTER: если установлен IPython, dash при импорте подключает интеграцию
+# с Jupyter (IPython, jedi, prompt_toolkit, requests), которая серверу не нужна.
+# EXO_SKIP_JUPYTER=1 запрещает импорт IPython на весь процесс (None в sys.modules):
+# любой код, который потом сделает import IPython, получит ImportError, поэтому
+# включать только для сервера/воркера, не для запуска из Jupyter или отладчика
+SKIP_JUPYTER = os.environ.get('EXO_SKIP_JUPYTER', '0') == '1'
+skipped_imports = ('IPython',)
+
+started = time.perf_counter()
+laps = []  # (этап, секунды) по порядку
+_last = [started]
+
+# модуль -> [время с вложенными импортами, собственное время]
+import_times = {}
+_stack = []
+_import = builtins.__import__
+
+
+def lap(name):
+    # конец очередного этапа запуска: время с конца предыдущего
+    now = time.perf_counter()
+    laps.append((name, now - _last[0]))
+    _last[0] = now
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level:
+        package = (globals or {}).get('__package__') or ''
+        full_name = importlib.util.resolve_name('.' * level + name, package)
+    else:
+        full_name = name
+    if full_name in sys.modules or full_name in import_times:
+        return _import(name, globals, locals, fromlist, level)
+    # засчитываем модуль тому, кто его импортировал первым
+    import_times[full_name] = entry = [0.0, 0.0]
+    _stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        children = _stack.pop()
+        entry[0], entry[1] = elapsed, elapsed - children
+        if _stack:
+            _stack[-1] += elapsed
+
+
+def setup_imports():
+    # вызывать до импорта тяжелых библиотек
+    if STARTUP_PROFILE:
+        builtins.__import__ = _timed_import
+    if SKIP_JUPYTER:
+        # None в sys.modules - импорт завершится ImportError; внутри Jupyter
+        # IPython уже загружен и остается как есть
+        for name in skipped_imports:
+            sys.modules.setdefault(name, None)
+
+
+def lazy_import(name):
+    # модуль, который выполнится при первом обращении к его атрибуту
+    if not LAZY_IMPORTS or name in sys.modules:
+        return importlib.import_module(name)
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def report_startup(top=15):
+    if not STARTUP_PROFILE:
+        return
+    builtins.__import__ = _import
+    total = time.perf_counter() - started
+    # собственное время импортов по пакетам верхнего уровня
+    packages = {}
+    for name, (_, own) in import_times.items():
+        package = name.partition('.')[0]
+        packages[package] = packages.get(package, 0) + own
+    slowest = sorted(import_times.items(), key=lambda item: -item[1][1])[:top]
+
+    lines = ['startup {:.3f}s (lazy imports: {}, skip jupyter: {})'.format(
+        total, 'on' if LAZY_IMPORTS else 'off', 'on' if SKIP_JUPYTER else 'off')]
+    lines += ['  {:<24} {:>8.3f}s'.format(name, seconds) for name, seconds in laps]
+    lines.append('imports by package (own time):')
+    lines += ['  {:<24} {:>8.3f}s'.format(name, seconds)
+              for name, seconds in sorted(packages.items(), key=lambda item: -item[1])[:top]]
+    lines.append('slowest modules (own / with nested imports):')
+    lines += ['  {:<40} {:>8.3f}s {:>8.3f}s'.format(name, own, cumulative)
+              for name, (cumulative, own) in slowest]
+    print('\n'.join(lines), file=sys.stderr)
+
+    if STARTUP_LOG:
+        record = {'time': time.time(), 'pid': os.getpid(), 'total': total,
+                  'lazy_imports': LAZY_IMPORTS, 'skip_jupyter': SKIP_JUPYTER, 'laps': dict(laps), 'packages': packages}
+        with open(STARTUP_LOG, 'a') as f:
+            f.write(json.dumps(record) + '\n')
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+# модули приложения импортируют друг друга по имени (from catalog import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CatalogAPI:
+    # stub asterank: строки каталога, запросы по диапазону ROW и limit.
+    # ETag - хэш тела ответа, как у статического сервера: меняется вместе с
+    # отданными строками, 304 - только на неизменившийся ответ. paged=False - API, которое игнорирует запрос по
+    # ROW; single=True - к тому же игнорирует limit (весь каталог одним ответом)
+
+    def __init__(self, rows, paged=True, single=False):
+        self.rows = rows
+        self.paged = paged
+        self.single = single
+        self.requests = []  # (query, limit, заголовки) каждого запроса
+
+    def page(self, query, limit):
+        rows = self.rows
+        if self.paged and query:
+            window = json.loads(query)['ROW']
+            rows = [row for row in rows if window['$gte'] <= row['ROW'] < window['$lt']]
+        if limit and not self.single:
+            rows = rows[:limit]
+        return rows
+
+    def body(self, query, limit):
+        body = json.dumps(self.page(query, limit)).encode('utf-8')
+        return body, '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(api):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = parse_qs(urlsplit(self.path).query)
+                query = params.get('query', [None])[0]
+                limit = int(params.get('limit', [0])[0])
+                api.requests.append((query, limit, dict(self.headers)))
+                body, etag = api.body(query, limit)
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return 'http://127.0.0.1:{}/api/kepler'.format(server.server_port)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
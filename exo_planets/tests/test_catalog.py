@@ -0,0 +1,258 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import catalog
+from conftest import CatalogAPI
+
+
+def make_rows(n):
+    # сырые строки каталога с колонками, которые нужны build_catalog
+    return [{'ROW': i, 'KOI': 1 + i, 'PER': 1.5 + i, 'A': 0.1 + i / 100,
+             'RSTAR': 0.5 + i % 3 * 0.4, 'RPLANET': 0.3 + i % 5, 'TPLANET': 150 + i % 7 * 60}
+            for i in range(n)]
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(catalog, 'SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setattr(catalog, 'SNAPSHOT_TTL', 60)
+    monkeypatch.setattr(catalog, 'API_PAGE_SIZE', 10)
+    monkeypatch.setattr(catalog, 'API_WORKERS', 2)
+    monkeypatch.setattr(catalog, 'API_LIMIT', 0)
+    monkeypatch.setattr(catalog, 'API_TIMEOUT', 5)
+    # по умолчанию API недоступно: порт 9 (discard) никто не слушает
+    monkeypatch.setattr(catalog, 'API_URL', 'http://127.0.0.1:9/api/kepler')
+
+
+def meta():
+    with open(catalog._snapshot_paths()[1]) as f:
+        return json.load(f)
+
+
+# SNAPSHOT
+
+def test_fresh_snapshot_is_read_without_network(monkeypatch, serve):
+    api = CatalogAPI(make_rows(47))
+    monkeypatch.setattr(catalog, 'API_URL', serve(api))
+    first = catalog.load_catalog()
+    api.requests.clear()
+    api.rows = make_rows(5)
+    pd.testing.assert_frame_equal(catalog.load_catalog(), first)
+    assert api.requests == []
+
+
+def test_stale_snapshot_is_used_when_api_is_down(monkeypatch, serve):
+    monkeypatch.setattr(catalog, 'API_URL', serve(CatalogAPI(make_rows(47))))
+    first = catalog.load_catalog()
+    monkeypatch.setattr(catalog, 'API_URL', 'http://127.0.0.1:9/api/kepler')
+    pd.testing.assert_frame_equal(catalog.load_catalog(max_age=0), first)
+
+
+def test_no_snapshot_and_api_down_raises():
+    with pytest.raises(catalog.requests.RequestException):
+        catalog.load_catalog()
+
+
+def test_snapshot_of_other_version_is_ignored(monkeypatch, serve):
+    monkeypatch.setattr(catalog, 'API_URL', serve(CatalogAPI(make_rows(47))))
+    catalog.load_catalog()
+    monkeypatch.setattr(catalog, 'SNAPSHOT_VERSION', catalog.SNAPSHOT_VERSION + 1)
+    assert catalog.read_snapshot() == (None, None)
+
+
+# CATALOG STATE
+
+def test_state_snapshot_is_consistent():
+    df = catalog.build_catalog(pd.DataFrame(make_rows(47)))
+    state = catalog.CatalogState(df)
+    other = catalog.build_catalog(pd.DataFrame(make_rows(20)))
+    assert state.swap(other) == 1
+    generation, current, index, fingerprint = state.snapshot()
+    assert generation == 1 and current is other
+    assert index is state.index
+    assert fingerprint == catalog.frame_fingerprint(other) != catalog.frame_fingerprint(df)
+
+
+def test_state_refresh_keeps_generation_when_catalog_unchanged(monkeypatch):
+    raw = pd.DataFrame(make_rows(47))
+    monkeypatch.setattr(catalog, 'load_catalog', lambda max_age=None: raw)
+    state = catalog.CatalogState(catalog.build_catalog(raw))
+    state.refresh()
+    assert state.generation == 0
+
+    changed = raw.copy()
+    changed.loc[3, 'RPLANET'] = 50.0
+    monkeypatch.setattr(catalog, 'load_catalog', lambda max_age=None: changed)
+    state.refresh()
+    assert state.generation == 1
+    assert state.df.loc[3, 'RPLANET'] == 50.0
+
+
+# PAGING
+
+def test_paged_fetch_reads_every_page(monkeypatch, serve):
+    api = CatalogAPI(make_rows(47))
+    monkeypatch.setattr(catalog, 'API_URL', serve(api))
+    df, response = catalog.fetch_catalog()
+    assert df['ROW'].tolist() == list(range(47))
+    # постраничный каталог: валидаторы первой страницы не возвращаются
+    assert response is None
+    # 5 страниц с данными и волна из пустых
+    assert len(api.requests) <= 5 + catalog.API_WORKERS
+
+
+def test_paged_fetch_respects_limit(monkeypatch, serve):
+    monkeypatch.setattr(catalog, 'API_URL', serve(CatalogAPI(make_rows(47))))
+    monkeypatch.setattr(catalog, 'API_LIMIT', 25)
+    df, _ = catalog.fetch_catalog()
+    assert df['ROW'].tolist() == list(range(25))
+
+
+def test_fetch_stops_when_api_ignores_row_query(monkeypatch, serve):
+    # API отдает первые limit строк на любой запрос: страницы не повторяются
+    api = CatalogAPI(make_rows(47), paged=False)
+    monkeypatch.setattr(catalog, 'API_URL', serve(api))
+    df, response = catalog.fetch_catalog()
+    assert df['ROW'].tolist() == list(range(10))
+    assert response is None
+    assert len(api.requests) <= 1 + catalog.API_WORKERS
+
+
+def test_fetch_stops_at_page_cap(monkeypatch, serve):
+    monkeypatch.setattr(catalog, 'API_URL', serve(CatalogAPI(make_rows(100))))
+    monkeypatch.setattr(catalog, 'API_MAX_PAGES', 3)
+    df, _ = catalog.fetch_catalog()
+    assert df['ROW'].tolist() == list(range(30))
+
+
+def test_single_response_catalog(monkeypatch, serve):
+    monkeypatch.setattr(catalog, 'API_URL', serve(CatalogAPI(make_rows(47), paged=False,
+                                                             single=True)))
+    df, response = catalog.fetch_catalog()
+    assert len(df) == 47
+    assert response.headers['ETag']
+
+
+def test_paged_snapshot_is_refetched_after_ttl(monkeypatch, serve):
+    api = CatalogAPI(make_rows(47))
+    monkeypatch.setattr(catalog, 'API_URL', serve(api))
+    catalog.load_catalog()
+    assert meta()['single_response'] is False
+
+    # первая страница прежняя, изменилась только третья
+    api.rows[25]['RPLANET'] = 99.0
+    api.requests.clear()
+    df = catalog.load_catalog(max_age=0)
+    assert df.loc[df['ROW'] == 25, 'RPLANET'].item() == 99.0
+    assert all('If-None-Match' not in headers for _, _, headers in api.requests)
+    assert catalog.read_snapshot()[0].loc[25, 'RPLANET'] == 99.0
+
+
+def test_single_response_snapshot_is_extended_on_304(monkeypatch, serve):
+    api = CatalogAPI(make_rows(47), paged=False, single=True)
+    monkeypatch.setattr(catalog, 'API_URL', serve(api))
+    first = catalog.load_catalog()
+    written = meta()
+    assert written['single_response'] is True and written['etag']
+
+    api.requests.clear()
+    time.sleep(0.01)
+    pd.testing.assert_frame_equal(catalog.load_catalog(max_age=0), first)
+    assert api.requests[0][2]['If-None-Match'] == written['etag']
+    assert meta()['fetched_at'] > written['fetched_at']
+
+
+def test_changed_single_response_catalog_is_refetched(monkeypatch, serve):
+    api = CatalogAPI(make_rows(47), paged=False, single=True)
+    monkeypatch.setattr(catalog, 'API_URL', serve(api))
+    catalog.load_catalog()
+    etag = meta()['etag']
+
+    api.rows = make_rows(50)
+    assert len(catalog.load_catalog(max_age=0)) == 50
+    assert meta()['etag'] != etag
+
+
+# SCHEMA
+
+def test_schema_keeps_fractional_koi():
+    raw = pd.DataFrame(make_rows(4))
+    raw['KOI'] = [1.01, 1.02, 2.01, 3.0]
+    df = catalog.build_catalog(raw)
+    assert df['KOI'].dtype == 'float64'
+    assert df['KOI'].tolist() == [1.01, 1.02, 2.01, 3.0]
+    assert df['ROW'].dtype == 'int8'
+
+
+def test_schema_downcasts_integral_koi():
+    df = catalog.build_catalog(pd.DataFrame(make_rows(4)))
+    assert df['KOI'].dtype == 'int8'
+
+
+# STATUS
+
+def old_status(df):
+    # статус цепочкой np.where, как до перехода на LookupClassifier
+    status = np.where((df['temp'] == 'optimal') & (df['gravity'] == 'optimal'),
+                      'promising', None)
+    status = np.where((df['temp'] == 'optimal') & (df['gravity'].isin(['low', 'high'])),
+                      'challening', status)
+    status = np.where((df['gravity'] == 'optimal') & (df['temp'].isin(['low', 'high'])),
+                      'challening', status)
+    return pd.Series(status, index=df.index).fillna('extreme')
+
+
+def test_status_rules_match_np_where_chain():
+    rng = np.random.default_rng(4)
+    raw = pd.DataFrame(make_rows(500))
+    # значения вокруг границ бинов, за их пределами и пропуски
+    raw['TPLANET'] = rng.choice([-5.0, 0.0, 150.0, 200.0, 300.0, 400.0, 450.0, 500.0,
+                                 900.0, 6000.0, np.nan], size=len(raw))
+    raw['RPLANET'] = rng.choice([-1.0, 0.0, 0.3, 0.5, 1.0, 2.0, 3.0, 4.0, 50.0,
+                                 150.0, np.nan], size=len(raw))
+    df = catalog.build_catalog(raw)
+    assert df['status'].astype(str).tolist() == old_status(df).tolist()
+    assert set(df['status']) == {'promising', 'challening', 'extreme'}
+
+
+# DELTA SYNC
+
+def rebuilt(rows):
+    return catalog.build_catalog(pd.DataFrame(rows)).reset_index(drop=True)
+
+
+def test_delta_sync_matches_full_rebuild(monkeypatch, serve):
+    api = CatalogAPI(make_rows(47))
+    monkeypatch.setattr(catalog, 'API_URL', serve(api))
+    delta = catalog.DeltaCatalog()
+    pd.testing.assert_frame_equal(delta.load(), rebuilt(api.rows))
+
+    # правки, удаление строки, опустевшая страница и новые строки;
+    # страница 1 (ROW 10-19) не меняется
+    rows = make_rows(56)
+    rows[7]['TPLANET'] = 450.0
+    rows[25]['RPLANET'] = 3.5
+    del rows[27]
+    rows = [row for row in rows if not 30 <= row['ROW'] < 40]
+    api.rows = rows
+    page_1 = delta.pages[1]
+    parsed = []
+    monkeypatch.setattr(catalog, '_parse_page',
+                        lambda response, parse=catalog._parse_page: parsed.append(1) or parse(response))
+    api.requests.clear()
+    pd.testing.assert_frame_equal(delta.refresh(), rebuilt(rows))
+    assert 3 not in delta.pages
+    # неизменившаяся страница проверена по ETag (304) и не разбиралась
+    assert delta.pages[1] == page_1
+    assert [headers['If-None-Match'] for query, _, headers in api.requests
+            if query and json.loads(query)['ROW']['$gte'] == 10] == [page_1['etag']]
+    assert len(parsed) == len(api.requests) - 1
+
+    # после рестарта разница считается от снимка на диске
+    restarted = catalog.DeltaCatalog()
+    pd.testing.assert_frame_equal(restarted.load(), rebuilt(rows))
+    assert restarted.refresh() is None
@@ -0,0 +1,60 @@
+import base64
+
+import numpy as np
+import pandas as pd
+
+from charts import point_delta, scatter_traces
+
+spec = {'x': 'RA', 'y': 'DEC', 'size': 'RPLANET', 'color': 'status'}
+colors = ['lightgray', '#1F85DE', '#f90f04']
+
+
+def catalog(n=500):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'RA': rng.uniform(280, 302, n), 'DEC': rng.uniform(36, 52, n),
+                         'RPLANET': rng.lognormal(0.8, 0.8, n).astype('float32'),
+                         'status': pd.Categorical(rng.choice(['promising', 'extreme'], n))})
+
+
+def values(array):
+    # массив трейса: список или base64-массив ({dtype, bdata})
+    if isinstance(array, dict):
+        return np.frombuffer(base64.b64decode(array['bdata']), dtype=array['dtype']).tolist()
+    return list(array)
+
+
+def apply(shown, change, attr):
+    # то же, что splice в apply_delta (assets/clientside.js)
+    kept = np.delete(np.array(values(shown), dtype=object), values(change['remove'])).tolist()
+    for position, value in zip(values(change['insert']), values(change[attr])):
+        kept.insert(position, value)
+    return kept
+
+
+def selection(df, lo, hi):
+    return df[(df['RPLANET'] > lo) & (df['RPLANET'] < hi)]
+
+
+def test_delta_rebuilds_new_traces():
+    df = catalog()
+    previous, current = selection(df, 0, 5), selection(df, 0.5, 6)
+    delta = point_delta(previous, current, spec)
+    shown = scatter_traces(previous, 'RA', 'DEC', 'status', colors, size='RPLANET')
+    expected = scatter_traces(current, 'RA', 'DEC', 'status', colors, size='RPLANET')
+    assert len(delta['traces']) == len(shown) == len(expected)
+    for old, change, new in zip(shown, delta['traces'], expected):
+        assert apply(old['x'], change, 'x') == values(new['x'])
+        assert apply(old['y'], change, 'y') == values(new['y'])
+        assert apply(old['marker']['size'], change, 'size') == values(new['marker']['size'])
+        assert change['sizeref'] == new['marker']['sizeref']
+
+
+def test_delta_needs_the_same_traces():
+    df = catalog()
+    only_extreme = df[df['status'] == 'extreme']
+    assert point_delta(df, only_extreme, spec) is None
+
+
+def test_large_change_sends_whole_figure():
+    df = catalog()
+    assert point_delta(selection(df, 0, 2), selection(df, 2, 100), spec) is None
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from datatable import filter_positions, split_filter_part
+
+
+def frame():
+    return pd.DataFrame({'KOI': [1.0, 2.0, 3.0, 4.0],
+                         'status': pd.Categorical(['promising', 'extreme', 'extreme', 'challening'])})
+
+
+def test_split_filter_part():
+    assert split_filter_part('{KOI} gt 100') == ('KOI', 'gt', 100.0)
+    assert split_filter_part('{status} contains "ext"') == ('status', 'contains', 'ext')
+
+
+def test_numeric_filter():
+    assert filter_positions(frame(), '{KOI} ge 2 && {KOI} lt 4').tolist() == [1, 2]
+
+
+def test_text_in_numeric_column_is_skipped():
+    # текст в числовой колонке и сравнение неупорядоченных категорий не падают
+    positions = filter_positions(frame(), '{KOI} gt abc && {status} gt extreme && {KOI} ne 1')
+    assert positions.tolist() == [1, 2, 3]
+
+
+def test_unknown_column_is_skipped():
+    assert np.array_equal(filter_positions(frame(), '{nope} eq 1'), np.arange(4))
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filters import FilterIndex
+
+
+def make_frame(n, seed=5):
+    rng = np.random.default_rng(seed)
+    radius = rng.choice([0.5, 1.0, 2.0, 3.0], size=n) + rng.random(n).round(1)
+    radius[rng.random(n) < 0.1] = np.nan
+    stars = pd.Categorical(rng.choice(['small', 'similar', 'bigger', None], size=n),
+                           categories=['small', 'similar', 'bigger'])
+    return pd.DataFrame({'RPLANET': radius.astype('float32'), 'StarSize': stars})
+
+
+@pytest.mark.parametrize('selected', [['small', 'similar', 'bigger'], ['similar'],
+                                      ['bigger', 'small'], [], None, ['unknown', 'small']])
+@pytest.mark.parametrize('lo, hi', [(0, 10), (1, 3), (1.5, 1.5), (2.0, 2.5), (3, 1), (-1, 0.5)])
+def test_query_matches_boolean_mask(selected, lo, hi):
+    df = make_frame(400)
+    # исходный фильтр тремя масками на весь фрейм
+    mask = ((df['RPLANET'] > lo) & (df['RPLANET'] < hi)
+            & (df['StarSize'].isin(selected or [])))
+    rows = FilterIndex(df).query(lo, hi, selected)
+    assert rows.tolist() == np.flatnonzero(mask.to_numpy()).tolist()
+    pd.testing.assert_frame_equal(df.iloc[rows], df[mask])
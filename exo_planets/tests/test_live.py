@@ -0,0 +1,37 @@
+import json
+
+from live import LatestRequests
+
+
+def test_newer_request_makes_older_stale():
+    latest = LatestRequests()
+    first = latest.begin('a')
+    second = latest.begin('a')
+    assert second > first
+    assert not latest.is_current('a', first)
+    assert latest.is_current('a', second)
+
+
+def test_sessions_are_independent():
+    latest = LatestRequests()
+    first = latest.begin('a')
+    latest.begin('b')
+    assert latest.is_current('a', first)
+
+
+def test_unknown_session_is_current():
+    # filter_data этой сессии обработал другой воркер
+    other, worker = LatestRequests(), LatestRequests()
+    seq = other.begin('a')
+    assert worker.is_current('a', seq)
+    assert worker.is_current('a', None)
+
+
+def test_seq_survives_browser_round_trip():
+    # метка проходит через dcc.Store: в JS это double, как float в python
+    latest = LatestRequests()
+    for _ in range(1000):
+        seq = latest.begin('a')
+        returned = json.loads(json.dumps(float(seq)))
+        assert returned == seq
+        assert latest.is_current('a', returned)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from plotly.io.json import to_json_plotly
+
+from encoder import dumps
+from metrics import _output_sizes
+
+encoders = {'fast': lambda value: dumps(value, html=False), 'plotly': to_json_plotly}
+
+
+def body(encode, outputs, side=None):
+    # ответ колбэка в том виде, в каком его собирает dash
+    response = {'multi': True, 'response': outputs}
+    if side is not None:
+        response['sideUpdate'] = side
+    return encode(response)
+
+
+@pytest.fixture(params=sorted(encoders))
+def encode(request):
+    return encoders[request.param]
+
+
+def test_single_output_is_whole_response(encode):
+    response = encode({'figure': {'data': []}})
+    assert _output_sizes('chart.figure', response) == {'chart.figure': len(response)}
+
+
+def test_props_of_one_component(encode):
+    page = {'columns': ['KOI'], 'data': [np.arange(5.0)]}
+    response = body(encode, {'raw-table-page': {'data': page},
+                             'raw-table': {'page_count': 12, 'page_current': 0}})
+    sizes = _output_sizes('..raw-table-page.data...raw-table.page_count...raw-table.page_current..',
+                          response)
+    assert sizes == {'raw-table-page.data': len(encode(page)),
+                     'raw-table.page_count': 2, 'raw-table.page_current': 1}
+
+
+def test_no_update_outputs_are_skipped(encode):
+    response = body(encode, {'chart-body': {'style': {}}, 'chart-message': {'children': None}})
+    sizes = _output_sizes('..chart-graph.figure...chart-traces.data...chart-body.style'
+                          '...chart-message.children..', response)
+    assert sizes == {'chart-body.style': 2, 'chart-message.children': 4}
+
+
+def test_side_update_is_not_counted(encode):
+    figure = {'data': [{'x': [1, 2, 3], 'name': 'a"b}'}], 'layout': {}}
+    response = body(encode, {'chart-graph': {'figure': figure}, 'chart-body': {'style': {}}},
+                    side={'other': {'children': 'x' * 50}})
+    sizes = _output_sizes('..chart-graph.figure...chart-body.style..', response)
+    assert sizes == {'chart-graph.figure': len(encode(figure)), 'chart-body.style': 2}
+
+
+def test_allow_duplicate_output(encode):
+    response = body(encode, {'chart-graph': {'figure': {'data': []}}, 'chart-body': {'style': {}}})
+    sizes = _output_sizes('..chart-graph.figure@0f1e...chart-body.style..', response)
+    assert sizes == {'chart-graph.figure@0f1e': len(encode({'data': []})), 'chart-body.style': 2}
@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+import shared
+from catalog import CatalogState, build_catalog
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture(autouse=True)
+def shared_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(shared, 'SHARED_DIR', str(tmp_path))
+    return tmp_path
+
+
+def raw(n, radius=1.0):
+    return pd.DataFrame({'ROW': range(n), 'KOI': range(1, n + 1), 'PER': [2.0] * n,
+                         'A': [0.1] * n, 'RSTAR': [1.0] * n, 'RPLANET': [radius] * n,
+                         'TPLANET': [300.0] * n})
+
+
+def segments(path):
+    return [name for name in os.listdir(path) if name.endswith('.arrow')]
+
+
+def test_refresh_disabled_never_rebuilds(shared_dir):
+    builds = []
+    catalog = shared.SharedCatalog(lambda: builds.append(1) or build_catalog(raw(10)), max_age=0)
+    state = CatalogState(catalog.load(), loader=catalog.refresh)
+    state.refresh()
+    state.refresh()
+    assert len(builds) == 1
+    assert state.generation == 0
+    assert len(segments(shared_dir)) == 1
+
+
+def test_same_data_is_not_republished(shared_dir):
+    frames = [build_catalog(raw(10))]
+    catalog = shared.SharedCatalog(lambda: frames[-1], max_age=1e-9)
+    state = CatalogState(catalog.load(), loader=catalog.refresh)
+    published = shared.read_pointer()
+    state.refresh()
+    assert state.generation == 0
+    assert shared.read_pointer()['name'] == published['name']
+    assert shared.read_pointer()['published_at'] > published['published_at']
+
+    frames.append(build_catalog(raw(10, radius=3.0)))
+    state.refresh()
+    assert state.generation == 1
+    assert shared.read_pointer()['name'] != published['name']
+    assert (state.df['RPLANET'] == 3.0).all()
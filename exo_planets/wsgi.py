@@ -0,0 +1,15 @@
+# WSGI entry point для продакшена (запуск из каталога exo_planets):
+#   gunicorn -c gunicorn.conf.py
+# или без конфига:
+#   gunicorn 'wsgi:create_app()' --workers 4 --threads 8
+from app import app, start_background_tasks
+
+# при импорте (в т.ч. в мастере gunicorn с preload_app) каталог, индексы и
+# layout уже построены - воркеры получают их готовыми через fork
+application = app.server
+
+
+def create_app():
+    # фабрика для запуска без preload: фоновые потоки стартуют в воркере
+    start_background_tasks()
+    return application